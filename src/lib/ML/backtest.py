@@ -0,0 +1,214 @@
+import argparse
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+from config import Config
+from random_forest import RandomForest
+from panel_features import build_close_panel, compute_panel_features
+
+# Walk-forward backtest of the portfolio process_investment_data builds.
+#
+#   python backtest.py                                 every constituent, risk tolerance 5
+#   python backtest.py --risk 8 --industry financial   the same universe a request would see
+#
+# At each rebalance date the forest is trained only on bars whose target return
+# was already known on that date, every ticker is scored, and the top-N positive
+# predictions for the risk level are held with equal weights until the next one.
+
+def _utc_ns(index):
+    index = pd.DatetimeIndex(index)
+    if index.tz is None:
+        index = index.tz_localize('UTC')
+    return index.tz_convert('UTC').as_unit('ns').asi8
+
+class WalkForwardBacktest:
+    """Features, closes and forward returns of every ticker on a shared date axis.
+    Built once, then run with as many strategies or forest settings as needed."""
+
+    def __init__(self, frames):
+        close, self.tickers, lengths = build_close_panel(frames)
+        panel = compute_panel_features(close)
+        stamps = [_utc_ns(frames[ticker].index) for ticker in self.tickers]
+        self.dates = np.unique(np.concatenate(stamps)) if stamps else np.array([], dtype=np.int64)
+
+        n_dates, n_tickers = len(self.dates), len(self.tickers)
+        horizon = Config.bars(Config.HORIZON_WEEKS)
+        self.features = np.full((n_dates, n_tickers, len(Config.FEATURES)), np.nan)
+        self.close = np.full((n_dates, n_tickers), np.nan)
+        self.target = np.full((n_dates, n_tickers), np.nan)
+        # Date axis position of the bar each target return ends on
+        self.target_end = np.full((n_dates, n_tickers), n_dates, dtype=np.int64)
+        for column, ticker in enumerate(self.tickers):
+            n = lengths[column]
+            rows = np.searchsorted(self.dates, stamps[column])
+            own = close[:n, column]
+            self.close[rows, column] = own
+            for k, name in enumerate(Config.FEATURES):
+                self.features[rows, column, k] = panel[name][:n, column]
+
+            # Target of a bar is the return over the ticker's own following horizon bars,
+            # as in training, so gaps in its history never stretch it over a longer span
+            if n > horizon:
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    self.target[rows[:-horizon], column] = own[horizon:] / own[:-horizon] - 1
+                self.target_end[rows[:-horizon], column] = rows[horizon:]
+        self.scorable = np.isfinite(self.features).all(axis=2) & (self.close > 0)
+        trainable = (self.scorable & np.isfinite(self.target)).ravel()
+
+        # Rows are ordered by date, so the training set of any date range is one slice
+        self.rows = np.flatnonzero(trainable)
+        self.date_starts = np.searchsorted(self.rows, np.arange(n_dates + 1) * n_tickers)
+        self.X = self.features.reshape(-1, len(Config.FEATURES))
+        self.y = self.target.ravel()
+        self.ends = self.target_end.ravel()
+
+    def training_set(self, first, last, known_by=None):
+        """Rows dated first..last inclusive with a known target, only those whose target
+        ended by date position known_by if given"""
+        rows = self.rows[self.date_starts[first]:self.date_starts[last + 1]]
+        if known_by is not None:
+            rows = rows[self.ends[rows] <= known_by]
+        return self.X[rows], self.y[rows]
+
+    def run(self, risk=5, tickers=None, make_model=None, rebalance_weeks=None,
+            retrain_weeks=None, min_train_weeks=None, train_window_weeks=None):
+        """Simulate the strategy and return its per-period returns, weights and summary metrics"""
+        make_model = make_model or (lambda: RandomForest(n_jobs=Config.TRAINING_JOBS, random_state=42))
+        step = Config.bars(rebalance_weeks or Config.REBALANCE_WEEKS)
+        retrain = max(Config.bars(retrain_weeks or Config.RETRAIN_WEEKS), step)
+        horizon = Config.bars(Config.HORIZON_WEEKS)
+        window = train_window_weeks if train_window_weeks is not None else Config.TRAIN_WINDOW_WEEKS
+        n_stocks = Config.RISK_LEVELS[Config.risk_level(risk)]['stocks']
+
+        universe = np.ones(len(self.tickers), dtype=bool)
+        if tickers is not None:
+            universe = np.isin(self.tickers, list(tickers))
+
+        # Each rebalance needs a full holding period after it to be scored
+        first = Config.bars(min_train_weeks or Config.MIN_TRAIN_WEEKS) + horizon
+        rebalances = np.arange(first, len(self.dates) - step, step)
+        if len(rebalances) == 0:
+            raise ValueError("Not enough history for a walk-forward backtest")
+
+        predictions = np.full((len(rebalances), len(self.tickers)), np.nan)
+        block_start = 0
+        while block_start < len(rebalances):
+            date = rebalances[block_start]
+            block = slice(block_start, np.searchsorted(rebalances, date + retrain))
+
+            # Only targets that ended by the rebalance date are known at that point. A target
+            # spans at least horizon positions of the date axis, more across a ticker's gaps.
+            last = date - horizon
+            start = 0 if window is None else max(0, last - Config.bars(window) + 1)
+            X, y = self.training_set(start, last, known_by=date)
+            scaler = StandardScaler().fit(X)
+            model = make_model()
+            model.fit(scaler.transform(X), y)
+
+            # Score every rebalance date up to the next retrain in one pass
+            scored = self.features[rebalances[block]]
+            flat = scored.reshape(-1, scored.shape[2])
+            ok = self.scorable[rebalances[block]].ravel()
+            values = np.full(len(flat), np.nan)
+            if ok.any():
+                values[ok] = model.predict(scaler.transform(flat[ok]))
+            predictions[block] = values.reshape(-1, len(self.tickers))
+            block_start = block.stop
+
+        weights = self.select(predictions, universe, n_stocks)
+
+        # Missing bars during a holding period keep the last known price
+        held = pd.DataFrame(self.close).ffill().values
+        with np.errstate(divide='ignore', invalid='ignore'):
+            realized = held[rebalances + step] / self.close[rebalances] - 1
+        returns = np.sum(weights * np.nan_to_num(realized), axis=1)
+        benchmark = np.nanmean(np.where(universe & self.scorable[rebalances], realized, np.nan), axis=1)
+
+        return {
+            'dates': pd.to_datetime(self.dates[rebalances], utc=True),
+            'returns': returns,
+            'benchmark_returns': np.nan_to_num(benchmark),
+            'weights': weights,
+            'metrics': self.summary(returns, weights, np.nan_to_num(benchmark), step)
+        }
+
+    @staticmethod
+    def select(predictions, universe, n_stocks):
+        """Equal weights on the top n_stocks positive predictions of each row, none if all are negative"""
+        score = np.where(universe & (predictions > 0), predictions, -np.inf)
+        top = np.argsort(-score, axis=1, kind='stable')[:, :n_stocks]
+        chosen = np.isfinite(np.take_along_axis(score, top, axis=1))
+        weights = np.zeros_like(score)
+        counts = np.maximum(chosen.sum(axis=1, keepdims=True), 1)
+        np.put_along_axis(weights, top, chosen / counts, axis=1)
+        return weights
+
+    @staticmethod
+    def summary(returns, weights, benchmark, step):
+        equity = np.cumprod(1 + returns)
+        drawdown = equity / np.maximum.accumulate(equity) - 1
+        periods_per_year = 52 * Config.BARS_PER_WEEK[Config.INTERVAL] / step
+        years = len(returns) / periods_per_year
+
+        # Fraction of the portfolio traded at each rebalance, starting from cash
+        previous = np.vstack([np.zeros((1, weights.shape[1])), weights[:-1]])
+        turnover = 0.5 * np.abs(weights - previous).sum(axis=1)
+
+        return {
+            'rebalances': len(returns),
+            'cumulative_return': float(equity[-1] - 1),
+            'annualized_return': float(equity[-1] ** (1 / years) - 1),
+            'annualized_volatility': float(np.std(returns) * np.sqrt(periods_per_year)),
+            'max_drawdown': float(drawdown.min()),
+            'average_turnover': float(turnover.mean()),
+            'average_holdings': float((weights > 0).sum(axis=1).mean()),
+            'invested_fraction': float((weights.sum(axis=1) > 0).mean()),
+            'benchmark_cumulative_return': float(np.prod(1 + benchmark) - 1)
+        }
+
+def load_frames(tickers):
+    from data_collector import FTSEDataCollector
+    return FTSEDataCollector().get_many(tickers, add_features=False)
+
+def main():
+    parser = argparse.ArgumentParser(description="Walk-forward backtest of the portfolio strategy")
+    parser.add_argument('--risk', type=float, default=5, help="risk tolerance between 1 and 10")
+    parser.add_argument('--industry', help="restrict the universe like a request for this industry")
+    parser.add_argument('--rebalance-weeks', type=int, default=Config.REBALANCE_WEEKS)
+    parser.add_argument('--retrain-weeks', type=int, default=Config.RETRAIN_WEEKS)
+    parser.add_argument('--min-train-weeks', type=int, default=Config.MIN_TRAIN_WEEKS)
+    parser.add_argument('--train-window-weeks', type=int, default=Config.TRAIN_WINDOW_WEEKS)
+    parser.add_argument('--trees', type=int, default=10)
+    parser.add_argument('--depth', type=int, default=5)
+    args = parser.parse_args()
+
+    from scraper import load_constituents, company_by_industry
+    stocks = company_by_industry(args.industry) if args.industry else load_constituents()
+    if not stocks:
+        print("No constituents available")
+        return
+
+    # Features are built from the whole index; the industry only narrows the picks
+    all_tickers = [stock['Ticker'] for stock in load_constituents()]
+    print(f"Loading prices for {len(all_tickers)} tickers...")
+    backtest = WalkForwardBacktest(load_frames(all_tickers))
+
+    print("Running walk-forward backtest...")
+    result = backtest.run(
+        risk=args.risk,
+        tickers=[stock['Ticker'] for stock in stocks],
+        make_model=lambda: RandomForest(n_trees=args.trees, max_depth=args.depth,
+                                        n_jobs=Config.TRAINING_JOBS, random_state=42),
+        rebalance_weeks=args.rebalance_weeks,
+        retrain_weeks=args.retrain_weeks,
+        min_train_weeks=args.min_train_weeks,
+        train_window_weeks=args.train_window_weeks
+    )
+
+    dates = result['dates']
+    print(f"\nBacktest from {dates[0]:%Y-%m-%d} to {dates[-1]:%Y-%m-%d}:")
+    for name, value in result['metrics'].items():
+        print(f"  {name:28s} {value:10.4f}")
+
+if __name__ == "__main__":
+    main()
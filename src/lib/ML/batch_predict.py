@@ -0,0 +1,44 @@
+import time
+from config import Config
+from predictor import StockPredictor
+from scraper import load_constituents
+from prediction_table import PredictionTable
+
+# Run after each weekly close, e.g. from cron on Friday evening:
+#   python batch_predict.py
+
+def build_prediction_table(predictor=None):
+    """Score every FTSE250 constituent and return a PredictionTable"""
+    predictor = predictor or StockPredictor()
+    if predictor.model_data is None:
+        print("Model not available")
+        return None
+
+    stocks = load_constituents()
+    if not stocks:
+        print("No constituents available")
+        return None
+    tickers = [stock['Ticker'] for stock in stocks]
+    print(f"Scoring {len(tickers)} stocks with model {predictor.model_version}...")
+
+    predictions = {}
+    for ticker, prediction in predictor.predict_many(tickers).items():
+        predictions[ticker] = {
+            'current_price': float(prediction['current_price']),
+            'predicted_return': float(prediction['predicted_return']),
+            'predicted_price': float(prediction['predicted_price']),
+            'as_of': prediction['as_of']
+        }
+    print(f"Scored {len(predictions)} of {len(tickers)} stocks")
+    return PredictionTable(predictions, predictor.model_version, time.time())
+
+def main():
+    table = build_prediction_table()
+    if table is None or not table.predictions:
+        print("\nPrediction table not updated")
+        return
+    table.save()
+    print(f"\nSaved prediction table to {Config.PREDICTION_TABLE_PATH}")
+
+if __name__ == "__main__":
+    main()
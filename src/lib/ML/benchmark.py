@@ -0,0 +1,269 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import subprocess
+import tempfile
+import tracemalloc
+import contextlib
+import numpy as np
+import pandas as pd
+from config import Config
+
+# Offline benchmarks for the training and prediction hot paths.
+#
+#   python benchmark.py                    run and compare against benchmark_baseline.json
+#   python benchmark.py --save-baseline    run and store the results as the new baseline
+#   python benchmark.py --recorded DIR     use a fixture captured with `python data_sources.py record DIR`
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+
+# Results where a larger number is better; everything else is a time or a size
+HIGHER_IS_BETTER = {'forest_predict_rows_per_s'}
+# Latency changes smaller than this are timer noise, whatever the ratio
+MIN_LATENCY_CHANGE_MS = 1.0
+
+def synthetic_panel(tickers, n_bars=260, seed=0):
+    """Geometric Brownian motion OHLCV frames, one per ticker, ending on the latest Monday"""
+    rng = np.random.default_rng(seed)
+    end = pd.Timestamp.now(tz='Europe/London').normalize()
+    end -= pd.Timedelta(days=end.weekday())
+    index = pd.date_range(end=end, periods=n_bars, freq='W-MON')
+    frames = {}
+    for ticker in tickers:
+        drift = rng.normal(0.001, 0.002)
+        vol = rng.uniform(0.02, 0.06)
+        close = 100 * np.exp(np.cumsum(rng.normal(drift, vol, n_bars)))
+        frames[ticker] = pd.DataFrame({
+            'Open': close * (1 + rng.normal(0, 0.005, n_bars)),
+            'High': close * 1.01,
+            'Low': close * 0.99,
+            'Close': close,
+            'Volume': rng.integers(10000, 1000000, n_bars).astype(float)
+        }, index=index)
+    return frames
+
+def recorded_panel(directory):
+    from data_sources import RecordedSource
+    source = RecordedSource(directory)
+    tickers = [stock['Ticker'] for stock in source.constituents() or []]
+    return source.download(tickers, Config.INTERVAL)
+
+def measure(func, repeat=1):
+    """Return (best seconds, peak traced MB, result) of calling func.
+    Memory is traced in a separate call so tracing does not slow the timed runs."""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak / 1e6, result
+
+def training_matrix(frames):
+    from panel_features import build_close_panel, compute_panel_features
+    from train_model import ModelTrainer
+    close, tickers, lengths = build_close_panel(frames)
+    features = compute_panel_features(close)
+    trainer = ModelTrainer.__new__(ModelTrainer)
+    all_X, all_y = [], []
+    for column in range(len(tickers)):
+        n = lengths[column]
+        X, y = trainer.training_rows(np.column_stack([features[name][:n, column] for name in Config.FEATURES]),
+                                     close[:n, column])
+        if X is not None:
+            all_X.append(X)
+            all_y.append(y)
+    return np.concatenate(all_X), np.concatenate(all_y)
+
+def bench_features(frames, results):
+    from data_collector import FTSEDataCollector
+    from panel_features import build_close_panel, compute_panel_features
+    collector = FTSEDataCollector.__new__(FTSEDataCollector)
+
+    seconds, peak, _ = measure(lambda: [collector._add_features(df.copy()) for df in frames.values()])
+    results['add_features_s'] = seconds
+    results['add_features_peak_mb'] = peak
+
+    seconds, peak, _ = measure(lambda: compute_panel_features(build_close_panel(frames)[0]), repeat=3)
+    results['panel_features_s'] = seconds
+    results['panel_features_peak_mb'] = peak
+
+def _fit_tree(X, y):
+    from random_forest import DecisionTree, compute_bin_edges, bin_features
+    edges = compute_bin_edges(X)
+    tree = DecisionTree(max_depth=5)
+    # Fixed feature subsets so every run builds the same tree
+    tree.fit_binned(bin_features(X, edges), y, edges, np.random.default_rng(0))
+    return tree
+
+def _fit_forest(X, y):
+    from random_forest import RandomForest
+    forest = RandomForest(random_state=0)
+    forest.fit(X, y)
+    return forest
+
+def bench_model(X, y, results):
+    seconds, peak, _ = measure(lambda: _fit_tree(X, y), repeat=3)
+    results['tree_fit_s'] = seconds
+    results['tree_fit_peak_mb'] = peak
+
+    seconds, peak, forest = measure(lambda: _fit_forest(X, y))
+    results['forest_fit_s'] = seconds
+    results['forest_fit_peak_mb'] = peak
+
+    seconds, peak, _ = measure(lambda: forest.predict(X), repeat=3)
+    results['forest_predict_rows_per_s'] = len(X) / seconds
+    results['forest_predict_peak_mb'] = peak
+    return forest
+
+def bench_requests(frames, forest, n_requests, results):
+    """End-to-end process_investment_data latency against a fresh local store, no network"""
+    from price_store import PriceStore
+    from model_registry import ModelRegistry
+
+    workdir = tempfile.mkdtemp(prefix='ftse_bench_')
+    Config.PRICE_STORE_DIR = os.path.join(workdir, 'prices')
+    Config.MODEL_REGISTRY_DIR = os.path.join(workdir, 'models')
+    Config.PREDICTION_TABLE_PATH = os.path.join(workdir, 'predictions.json')
+    Config.CONSTITUENTS_MAX_AGE_HOURS = float('inf')
+
+    store = PriceStore(os.path.join(Config.PRICE_STORE_DIR, Config.INTERVAL))
+    for ticker, df in frames.items():
+        store.save(ticker, df)
+    # The forest was trained on raw features, which is what registered models score
+    ModelRegistry().register(forest, None, Config.FEATURES, {'mse': 0.0})
+
+    import main
+    from predictor import StockPredictor
+    logging.getLogger().setLevel(logging.WARNING)
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        main._predictor = StockPredictor()
+
+    stocks = pd.read_csv(Config.CONSTITUENTS_PATH)
+    industries = sorted(stocks['Industry'].unique())
+    latencies = []
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        # Warm the constituents, industry index and indicator states before timing
+        for industry in industries:
+            main.process_investment_data({'investment_amount': 10000, 'risk_tolerance': 5, 'industry': industry})
+        for i in range(n_requests):
+            request = {
+                'investment_amount': 10000,
+                'risk_tolerance': 1 + i % 10,
+                'industry': industries[i % len(industries)]
+            }
+            start = time.perf_counter()
+            main.process_investment_data(request)
+            latencies.append(time.perf_counter() - start)
+
+    latencies = np.array(latencies) * 1000
+    for q in [50, 90, 99]:
+        results[f'request_p{q}_ms'] = float(np.percentile(latencies, q))
+    bench_cold_start(industries[0], results)
+
+# Run in a fresh interpreter: imports, model load and one request against the bench store
+COLD_START = """
+import sys, time
+start = time.perf_counter()
+from config import Config
+Config.PRICE_STORE_DIR, Config.MODEL_REGISTRY_DIR, Config.PREDICTION_TABLE_PATH = sys.argv[1:4]
+Config.CONSTITUENTS_MAX_AGE_HOURS = float('inf')
+import main
+main.process_investment_data({'investment_amount': 10000, 'risk_tolerance': 5, 'industry': sys.argv[4]})
+print(time.perf_counter() - start)
+"""
+
+def bench_cold_start(industry, results, repeat=3):
+    """Seconds from interpreter start to the first answered request, best of repeat"""
+    args = [Config.PRICE_STORE_DIR, Config.MODEL_REGISTRY_DIR, Config.PREDICTION_TABLE_PATH, industry]
+    best = None
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, '-c', COLD_START] + args, capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+        elapsed = float(out.stdout.strip().splitlines()[-1])
+        best = elapsed if best is None else min(best, elapsed)
+    results['cold_start_ms'] = best * 1000
+
+def compare(results, baseline, tolerance):
+    """Return descriptions of results that are worse than the baseline by more than tolerance"""
+    regressions = []
+    for name, value in results.items():
+        if name not in baseline or not baseline[name]:
+            continue
+        ratio = value / baseline[name]
+        if name in HIGHER_IS_BETTER:
+            worse = ratio < 1 - tolerance
+        else:
+            worse = ratio > 1 + tolerance
+        if name.endswith('_ms') and value - baseline[name] < MIN_LATENCY_CHANGE_MS:
+            worse = False
+        if worse:
+            regressions.append(f"{name}: {value:.4g} vs baseline {baseline[name]:.4g}")
+    return regressions
+
+def run(args):
+    if args.recorded:
+        frames = recorded_panel(args.recorded)
+        source = f"recorded:{args.recorded}"
+    else:
+        tickers = pd.read_csv(Config.CONSTITUENTS_PATH)['Ticker'].tolist()
+        frames = synthetic_panel(tickers, n_bars=args.bars)
+        source = f"synthetic:{len(tickers)}x{args.bars}"
+    print(f"Benchmarking on {len(frames)} tickers ({source})")
+
+    results = {}
+    bench_features(frames, results)
+    X, y = training_matrix(frames)
+    results['training_rows'] = len(X)
+    forest = bench_model(X, y, results)
+    bench_requests(frames, forest, args.requests, results)
+    return source, results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the training and prediction hot paths")
+    parser.add_argument('--bars', type=int, default=260, help="bars per synthetic ticker")
+    parser.add_argument('--recorded', help="fixture directory written by data_sources.py record")
+    parser.add_argument('--requests', type=int, default=50, help="end-to-end requests to time")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed slowdown before flagging")
+    parser.add_argument('--save-baseline', action='store_true', help="store results as the new baseline")
+    args = parser.parse_args()
+
+    source, results = run(args)
+
+    print("\nResults:")
+    for name, value in results.items():
+        print(f"  {name:32s} {value:12.4f}")
+
+    if args.save_baseline:
+        with open(BASELINE_PATH, 'w') as f:
+            json.dump({'source': source, 'results': results}, f, indent=2)
+        print(f"\nSaved baseline to {BASELINE_PATH}")
+        return
+
+    try:
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)
+    except (OSError, ValueError):
+        print("\nNo baseline to compare against, run with --save-baseline")
+        return
+
+    if baseline.get('source') != source:
+        print(f"\nBaseline was recorded on {baseline.get('source')}, comparison may not be meaningful")
+    regressions = compare(results, baseline['results'], args.tolerance)
+    if regressions:
+        print("\nRegressions:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print("\nNo regressions against baseline")
+
+if __name__ == "__main__":
+    main()
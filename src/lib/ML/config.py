@@ -1,3 +1,5 @@
+import os
+
 class Config:
     FEATURES = [
         'return_1w',
@@ -12,4 +14,155 @@ class Config:
         'HIGH': {'stocks': 4},
         'MEDIUM': {'stocks': 6},
         'LOW': {'stocks': 8}
-    }
\ No newline at end of file
+    }
+
+    # Bar interval and prediction horizon. Indicator windows are defined in weeks
+    # and scaled to bars of the chosen interval.
+    INTERVAL = '1wk'
+    HORIZON_WEEKS = 1
+    BARS_PER_WEEK = {
+        '1wk': 1,
+        '1d': 5,
+        '1h': 45,
+        '30m': 85,
+        '15m': 170,
+        '5m': 510
+    }
+    RETURN_WEEKS = [1, 4, 12]
+    SMA_WEEKS = 3
+    RSI_WEEKS = 14
+    MACD_FAST_WEEKS = 12
+    MACD_SLOW_WEEKS = 26
+    MACD_SIGNAL_WEEKS = 9
+    VOLATILITY_WEEKS = 12
+
+    # Local price history, one partition per ticker and interval
+    HISTORY_YEARS = 5
+    # Yahoo only serves this many days of intraday bars
+    MAX_INTRADAY_DAYS = {
+        '1h': 730,
+        '30m': 60,
+        '15m': 60,
+        '5m': 60
+    }
+    # 'live' fetches from Yahoo and Wikipedia, 'recorded:<dir>' replays a fixture
+    # captured with `python data_sources.py record <dir>`
+    DATA_SOURCE = os.environ.get('FTSE_DATA_SOURCE', 'live')
+    PRICE_STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'price_store')
+    PRICE_STORE_MAX_AGE_HOURS = 12
+
+    # Bulk downloads in get_many
+    DOWNLOAD_GROUP_SIZE = 50
+    DOWNLOAD_WORKERS = 4
+    DOWNLOAD_RETRIES = 3
+    DOWNLOAD_BACKOFF_SECONDS = 1.0
+    # Each Yahoo call gives up after this long, so a stalled one cannot hold a thread
+    DOWNLOAD_TIMEOUT_SECONDS = 10
+
+    # Processes used to train forest trees, -1 for one per CPU
+    TRAINING_JOBS = -1
+
+    # Saved models and their manifest
+    MODEL_REGISTRY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models')
+    MODEL_REFRESH_SECONDS = 60
+
+    # Precomputed predictions written by batch_predict.py
+    PREDICTION_TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'predictions.json')
+    PREDICTION_TABLE_MAX_AGE_HOURS = 8 * 24
+    CONSTITUENTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'FTSE250.csv')
+    CONSTITUENTS_MAX_AGE_HOURS = 24 * 7
+
+    # Live scoring fan-out in process_investment_data. Tickers are fetched in groups of at most
+    # FANOUT_GROUP_SIZE on a shared pool, at most FANOUT_GROUPS_PER_REQUEST groups in flight
+    # for any one request. A group still fetching after FETCH_GROUP_TIMEOUT_SECONDS drops only
+    # its own tickers; it stops counting against the request's cap and its thread is freed once
+    # the Yahoo call behind it gives up after DOWNLOAD_TIMEOUT_SECONDS per attempt.
+    PREDICTION_FANOUT_WORKERS = 16
+    FANOUT_GROUP_SIZE = 5
+    FANOUT_GROUPS_PER_REQUEST = 4
+    FETCH_GROUP_TIMEOUT_SECONDS = 15
+    REQUEST_DEADLINE_SECONDS = 30
+    # Worker requests may ask for cProfile stats only when the server sets FTSE_PROFILE_REQUESTS=1
+    PROFILE_REQUESTS = os.environ.get('FTSE_PROFILE_REQUESTS') == '1'
+
+    # Stock selections kept per (industry, risk level, model, data as-of) so repeat
+    # requests only rescale by amount. Selections scored live expire with the prices behind them.
+    PORTFOLIO_CACHE_SIZE = 256
+    PORTFOLIO_CACHE_LIVE_SECONDS = 3600
+
+    # Directory for a memory-mapped training matrix, None keeps it in RAM.
+    # When set, the forest is trained out of core in chunks of this many rows.
+    TRAINING_MATRIX_DIR = None
+    TRAINING_CHUNK_ROWS = 100000
+
+    # Weekly warm start (train_model.py --warm-start). WARM_START_TREES new trees are trained
+    # on the last WARM_START_WINDOW_WEEKS of bars, then the oldest trees are retired so at most
+    # WARM_START_MAX_TREES remain (None for the tuned n_trees) and, if set, none is older
+    # than WARM_START_MAX_AGE_WEEKS. Each stock's last WARM_START_HOLDOUT_WEEKS of bars are
+    # held out of the new trees and used to evaluate the result.
+    WARM_START_TREES = 2
+    WARM_START_WINDOW_WEEKS = 104
+    WARM_START_HOLDOUT_WEEKS = 13
+    WARM_START_MAX_TREES = None
+    WARM_START_MAX_AGE_WEEKS = None
+
+    # Walk-forward backtest in backtest.py. Portfolios are held for REBALANCE_WEEKS,
+    # matching the rebalance date given with each recommendation, and the forest is
+    # retrained every RETRAIN_WEEKS on the bars before the rebalance date.
+    REBALANCE_WEEKS = 4
+    RETRAIN_WEEKS = 4
+    MIN_TRAIN_WEEKS = 52
+    # Weeks of history each retrain sees, None for everything before the rebalance date
+    TRAIN_WINDOW_WEEKS = None
+
+    # Hyperparameter search in tune_model.py. The feature matrix is cached here and
+    # rebuilt once it is older than SEARCH_CACHE_MAX_AGE_HOURS.
+    SEARCH_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'search_cache')
+    SEARCH_CACHE_MAX_AGE_HOURS = 24
+    SEARCH_FOLDS = 4
+    # Processes evaluating trials, -1 for one per CPU
+    SEARCH_JOBS = -1
+    SEARCH_GRID = {
+        'n_trees': [10, 25, 50],
+        'max_depth': [4, 5, 6, 8],
+        'max_features': [2, 3, 5],
+        'max_bins': [32, 64, 255]
+    }
+
+    @classmethod
+    def bars(cls, weeks):
+        """Number of bars of the configured interval covering this many weeks"""
+        return weeks * cls.BARS_PER_WEEK[cls.INTERVAL]
+
+    @classmethod
+    def risk_level(cls, risk):
+        """RISK_LEVELS key for a risk tolerance between 1 and 10"""
+        if risk > 7:
+            return 'HIGH'
+        if risk > 4:
+            return 'MEDIUM'
+        return 'LOW'
+
+    @classmethod
+    def replay(cls, directory):
+        """Serve prices and constituents from a recorded fixture. The price store,
+        constituents snapshot, prediction table, search cache and model registry move
+        under DIR/replay, so a model trained on the fixture is never hot-swapped into a
+        worker serving live data. Train one with train_model.py before serving a replay."""
+        cls.DATA_SOURCE = f"recorded:{directory}"
+        work = os.path.join(directory, 'replay')
+        cls.PRICE_STORE_DIR = os.path.join(work, 'price_store')
+        cls.CONSTITUENTS_PATH = os.path.join(work, 'FTSE250.csv')
+        cls.PREDICTION_TABLE_PATH = os.path.join(work, 'predictions.json')
+        cls.SEARCH_CACHE_DIR = os.path.join(work, 'search_cache')
+        cls.MODEL_REGISTRY_DIR = os.path.join(work, 'models')
+        os.makedirs(work, exist_ok=True)
+
+    @classmethod
+    def history_period(cls):
+        if cls.INTERVAL in cls.MAX_INTRADAY_DAYS:
+            return f"{cls.MAX_INTRADAY_DAYS[cls.INTERVAL]}d"
+        return f"{cls.HISTORY_YEARS}y"
+
+if Config.DATA_SOURCE.startswith('recorded:'):
+    Config.replay(Config.DATA_SOURCE[len('recorded:'):])
@@ -0,0 +1,12 @@
+import importlib
+import pytest
+
+@pytest.fixture
+def main(tmp_path_factory, monkeypatch):
+    """The main module, imported from a scratch directory so its log file lands there.
+    Each test gets an empty selection cache."""
+    monkeypatch.chdir(tmp_path_factory.getbasetemp())
+    module = importlib.import_module('main')
+    from portfolio_cache import PortfolioCache
+    monkeypatch.setattr(module, '_portfolio_cache', PortfolioCache())
+    return module
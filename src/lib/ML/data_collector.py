@@ -1,20 +1,29 @@
-import yfinance as yf
-import pandas as pd
+import os
+import time
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+from price_store import PriceStore
+from indicator_state import IndicatorState
+from data_sources import price_source
+from metrics import metrics
+
+# pandas is imported by the methods that handle price frames, so a request answered
+# from saved indicator state (_latest_from_state) never imports it
 
 class FTSEDataCollector:
-    def __init__(self):
-        pass
+    def __init__(self, store=None, source=None):
+        self.source = source or price_source()
+        self.store = store or PriceStore(os.path.join(Config.PRICE_STORE_DIR, Config.INTERVAL))
         
     def get_stock_data(self, ticker):
         try:
             if not ticker.endswith('.L'):
                 ticker = f"{ticker}.L"
                 
-            stock = yf.Ticker(ticker)
-            df = stock.history(period="5y", interval="1wk")
+            df = self._get_prices(ticker)
             
-            if df.empty:
+            if df is None or df.empty:
                 return None
                 
             return self._add_features(df)
@@ -22,36 +31,238 @@ class FTSEDataCollector:
         except Exception as e:
             print(f"Error collecting data for {ticker}: {e}")
             return None
+
+    def _get_prices(self, ticker):
+        """Read bars from the local store, fetching only bars newer than the last stored one.
+        Threads refreshing the same ticker wait for each other, then read the fresh bars."""
+        with self.store.lock(ticker):
+            return self._refresh_prices(ticker)
+
+    def _refresh_prices(self, ticker):
+        stored, fetched_at = self.store.load(ticker)
+        if stored is not None and self.store.is_fresh(fetched_at):
+            metrics.count('price_store_hit')
+            return self._history_window(stored)
+        metrics.count('price_store_miss')
+
+        try:
+            if stored is None or stored.empty:
+                new = self.source.history(ticker, Config.INTERVAL, period=Config.history_period())
+            else:
+                # The last stored bar may be a partial week, so fetch it again
+                new = self.source.history(ticker, Config.INTERVAL, start=stored.index[-1].strftime('%Y-%m-%d'))
+        except Exception as e:
+            metrics.count('fetch_error')
+            if stored is None:
+                raise
+            print(f"Error refreshing {ticker}, using stored data: {e}")
+            return self._history_window(stored)
+
+        return self._store_bars(ticker, stored, new)
+
+    def _store_bars(self, ticker, stored, new):
+        with self.store.lock(ticker):
+            # Merge into what is stored now, another thread may have saved since stored was read
+            current, _ = self.store.load(ticker)
+            df = PriceStore.merge(stored if current is None else current, new)
+            if df is None or df.empty:
+                return None
+            self.store.save(ticker, df)
+        return self._history_window(df)
+
+    def get_many(self, tickers, add_features=True):
+        """Return {ticker: DataFrame with features} for every ticker that has data,
+        downloading stale tickers in grouped requests from a bounded thread pool.
+        With add_features=False the frames only hold the stored price columns."""
+        names = {(t if t.endswith('.L') else f"{t}.L"): t for t in tickers}
+        prices = {}
+        stale = {}
+        for ticker in names:
+            stored, fetched_at = self.store.load(ticker)
+            if stored is not None and self.store.is_fresh(fetched_at):
+                metrics.count('price_store_hit')
+                prices[ticker] = self._history_window(stored)
+            else:
+                metrics.count('price_store_miss')
+                stale[ticker] = stored
+
+        # Full downloads and top-ups need different date ranges, so group them separately
+        missing = [t for t, stored in stale.items() if stored is None or stored.empty]
+        topups = [t for t in stale if t not in missing]
+        size = Config.DOWNLOAD_GROUP_SIZE
+        groups = [missing[i:i + size] for i in range(0, len(missing), size)]
+        groups += [topups[i:i + size] for i in range(0, len(topups), size)]
+
+        if groups:
+            with ThreadPoolExecutor(max_workers=Config.DOWNLOAD_WORKERS) as pool:
+                for fetched in pool.map(lambda group: self._fetch_group(group, stale), groups):
+                    prices.update(fetched)
+
+        results = {}
+        for ticker, df in prices.items():
+            if df is None or df.empty:
+                continue
+            if not add_features:
+                results[names[ticker]] = df
+                continue
+            featured = self._add_features(df)
+            if featured is not None:
+                results[names[ticker]] = featured
+        return results
+
+    def get_latest_features_many(self, tickers):
+        """Latest features for many tickers, fetching prices only for those whose state is not current"""
+        results = {}
+        missing = []
+        for ticker in tickers:
+            name = ticker if ticker.endswith('.L') else f"{ticker}.L"
+            with metrics.time('state_lookup'):
+                latest = self._latest_from_state(name)
+            if latest is not None:
+                results[ticker] = latest
+            else:
+                missing.append(ticker)
+
+        if missing:
+            with metrics.time('fetch_batch'):
+                prices = self.get_many(missing, add_features=False)
+            for ticker, df in prices.items():
+                name = ticker if ticker.endswith('.L') else f"{ticker}.L"
+                with metrics.time('features'):
+                    latest = self._advance_state(name, df)
+                if latest is not None:
+                    results[ticker] = latest
+        return results
+
+    def _latest_from_state(self, ticker):
+        """Answer from the saved state alone when the store is fresh and the state has its newest bar"""
+        meta = self.store.load_meta(ticker)
+        saved = self.store.load_state(ticker)
+        if meta is None or saved is None or not self.store.is_fresh(meta['fetched_at']):
+            metrics.count('state_cache_miss')
+            return None
+        if saved['latest']['date'] != meta['last_date']:
+            metrics.count('state_cache_miss')
+            return None
+        metrics.count('state_cache_hit')
+        state = IndicatorState.from_dict(saved['state'])
+        return self._latest(state, saved['latest'])
+
+    def _advance_state(self, ticker, df):
+        """Bring the ticker's indicator state up to date with df and save it.
+        The state covers every bar except the newest, which may still be a partial week."""
+        try:
+            closes = df['Close'].values
+            dates = [str(date) for date in df.index]
+            with self.store.lock(ticker):
+                saved = self.store.load_state(ticker)
+
+                start = 0
+                state = IndicatorState()
+                if saved is not None and saved['state']['last_date'] in dates[:-1]:
+                    state = IndicatorState.from_dict(saved['state'])
+                    start = dates.index(state.last_date) + 1
+                for i in range(start, len(closes) - 1):
+                    state.update(closes[i], dates[i])
+
+                latest = {'date': dates[-1], 'close': float(closes[-1])}
+                self.store.save_state(ticker, {'state': state.to_dict(), 'latest': latest})
+            return self._latest(state, latest)
+        except Exception as e:
+            print(f"Error updating indicators for {ticker}: {e}")
+            return None
+
+    def _latest(self, state, latest):
+        return {
+            'features': state.features_after(latest['close']),
+            'close': latest['close'],
+            'date': latest['date']
+        }
+
+    def _fetch_group(self, group, stale):
+        """Download one group of tickers, retrying the ones that came back empty"""
+        starts = [stale[t].index[-1] for t in group if stale[t] is not None and not stale[t].empty]
+        if starts:
+            # The last stored bar may be a partial week, so fetch it again
+            kwargs = {'start': min(starts).strftime('%Y-%m-%d')}
+        else:
+            kwargs = {'period': Config.history_period()}
+
+        prices = {}
+        remaining = list(group)
+        for attempt in range(Config.DOWNLOAD_RETRIES):
+            if attempt:
+                time.sleep(Config.DOWNLOAD_BACKOFF_SECONDS * 2 ** (attempt - 1))
+            try:
+                with metrics.time('download'):
+                    data = self.source.download(remaining, Config.INTERVAL, **kwargs)
+            except Exception as e:
+                metrics.count('download_error')
+                print(f"Error downloading {len(remaining)} tickers (attempt {attempt + 1}): {e}")
+                continue
+
+            failed = []
+            for ticker in remaining:
+                new = data.get(ticker)
+                if new is None:
+                    failed.append(ticker)
+                    continue
+                try:
+                    prices[ticker] = self._store_bars(ticker, stale[ticker], new)
+                except Exception as e:
+                    print(f"Error storing data for {ticker}: {e}")
+            remaining = failed
+            if not remaining:
+                break
+
+        for ticker in remaining:
+            print(f"Failed to download data for {ticker}")
+            metrics.count('download_failed_ticker')
+            # Fall back to whatever is already stored
+            if stale[ticker] is not None:
+                prices[ticker] = self._history_window(stale[ticker])
+        return prices
+
+    def _history_window(self, df):
+        import pandas as pd
+        if df.empty:
+            return df
+        if Config.INTERVAL in Config.MAX_INTRADAY_DAYS:
+            start = df.index[-1] - pd.DateOffset(days=Config.MAX_INTRADAY_DAYS[Config.INTERVAL])
+        else:
+            start = df.index[-1] - pd.DateOffset(years=Config.HISTORY_YEARS)
+        return df[df.index > start].copy()
             
     def _add_features(self, df):
+        import pandas as pd
         try:
             close = df['Close'].values
             
             # Basic returns
-            for period in [1, 4, 12]:
-                df[f'return_{period}w'] = df['Close'].pct_change(period)
+            for weeks in Config.RETURN_WEEKS:
+                df[f'return_{weeks}w'] = df['Close'].ffill().pct_change(Config.bars(weeks))
             # Simple moving average crossover
-            sma20 = pd.Series(close).rolling(window=3).mean()
+            sma20 = pd.Series(close).rolling(window=Config.bars(Config.SMA_WEEKS)).mean().values
             df['sma_cross'] = (close > sma20).astype(float)
             
             # Basic RSI
             delta = np.diff(close, prepend=close[0])
             gain = np.where(delta > 0, delta, 0)
             loss = np.where(delta < 0, -delta, 0)
-            avg_gain = pd.Series(gain).rolling(window=14).mean()
-            avg_loss = pd.Series(loss).rolling(window=14).mean()
+            avg_gain = pd.Series(gain).rolling(window=Config.bars(Config.RSI_WEEKS)).mean()
+            avg_loss = pd.Series(loss).rolling(window=Config.bars(Config.RSI_WEEKS)).mean()
             rs = avg_gain / (avg_loss + 1e-9)
-            df['rsi'] = 100 - (100 / (1 + rs))
+            df['rsi'] = (100 - (100 / (1 + rs))).values
             
             # Simple MACD
-            exp12 = pd.Series(close).ewm(span=12).mean()
-            exp26 = pd.Series(close).ewm(span=26).mean()
+            exp12 = pd.Series(close).ewm(span=Config.bars(Config.MACD_FAST_WEEKS)).mean()
+            exp26 = pd.Series(close).ewm(span=Config.bars(Config.MACD_SLOW_WEEKS)).mean()
             macd = exp12 - exp26
-            signal = macd.rolling(window=9).mean()
-            df['macd_signal'] = (macd > signal).astype(float)
+            signal = macd.rolling(window=Config.bars(Config.MACD_SIGNAL_WEEKS)).mean()
+            df['macd_signal'] = (macd > signal).astype(float).values
             
             # Basic volatility
-            df['volatility'] = pd.Series(df['return_1w']).rolling(window=12).std()
+            df['volatility'] = pd.Series(df['return_1w']).rolling(window=Config.bars(Config.VOLATILITY_WEEKS)).std()
             
             return df.fillna(0)
             
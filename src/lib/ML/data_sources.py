@@ -0,0 +1,166 @@
+import os
+import sys
+from config import Config
+from price_store import PriceStore
+
+# Where FTSEDataCollector gets prices and get_ftse250 gets constituents.
+#
+#   python data_sources.py record DIR                          capture a fixture from Yahoo and Wikipedia
+#   FTSE_DATA_SOURCE=recorded:DIR python train_model.py        train a model on it
+#   FTSE_DATA_SOURCE=recorded:DIR python main.py --worker      replay it with no network
+#
+# A fixture holds constituents.csv and prices/<interval>/, a PriceStore of the raw bars.
+# Config.replay keeps the files derived from a replay under DIR/replay so they never
+# mix with live data.
+
+class YahooSource:
+    """Live OHLCV bars from Yahoo Finance"""
+
+    def history(self, ticker, interval, period=None, start=None):
+        import yfinance as yf
+        return yf.Ticker(ticker).history(interval=interval, timeout=Config.DOWNLOAD_TIMEOUT_SECONDS,
+                                         **_window(period, start))
+
+    def download(self, tickers, interval, period=None, start=None):
+        """Return {ticker: DataFrame} for the tickers that came back with bars"""
+        import yfinance as yf
+        data = yf.download(tickers, interval=interval, group_by='ticker', auto_adjust=True,
+                           ignore_tz=False, threads=False, progress=False,
+                           timeout=Config.DOWNLOAD_TIMEOUT_SECONDS, **_window(period, start))
+        frames = {}
+        for ticker in tickers:
+            try:
+                df = data[ticker].dropna(how='all')
+            except KeyError:
+                continue
+            if not df.empty:
+                frames[ticker] = df
+        return frames
+
+class WikipediaSource:
+    """Live FTSE 250 constituents scraped from Wikipedia"""
+
+    URL = "https://en.wikipedia.org/wiki/FTSE_250_Index#Constituents"
+
+    def constituents(self):
+        """Return [{'Company', 'Ticker', 'Industry'}], or None if the page could not be read"""
+        import requests
+        from bs4 import BeautifulSoup
+        try:
+            response = requests.get(self.URL)
+        except requests.RequestException as e:
+            print(f"Error fetching: {str(e)}")
+            return None
+
+        soup = BeautifulSoup(response.content, 'html.parser')
+        table = soup.find_all('table', class_='wikitable')
+        if len(table) < 3:
+            return None
+
+        stocks = []
+        for row in table[2].find_all('tr')[1:]:
+            cols = row.find_all('td')
+            if len(cols) > 1:
+                stocks.append({
+                    'Company': cols[0].text.strip(),
+                    'Ticker': cols[1].text.strip() + '.L',
+                    'Industry': cols[2].text.strip()
+                })
+        return stocks
+
+class RecordedSource:
+    """Replays a fixture written by record(), holding each ticker in memory after its first read"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._stores = {}
+        self._frames = {}
+        self._constituents = None
+
+    def _store(self, interval):
+        store = self._stores.get(interval)
+        if store is None:
+            store = PriceStore(os.path.join(self.directory, 'prices', interval), max_age_hours=float('inf'))
+            self._stores[interval] = store
+        return store
+
+    def history(self, ticker, interval, period=None, start=None):
+        # The recording is the whole history, so period is ignored
+        import pandas as pd
+        key = (ticker, interval)
+        df = self._frames.get(key)
+        if df is None:
+            df, _ = self._store(interval).load(ticker)
+            if df is None:
+                df = pd.DataFrame(columns=PriceStore.COLUMNS, index=pd.DatetimeIndex([], tz='UTC'))
+            self._frames[key] = df
+        if start is not None:
+            df = df[df.index >= pd.Timestamp(start, tz=df.index.tz)]
+        return df.copy()
+
+    def download(self, tickers, interval, period=None, start=None):
+        frames = {}
+        for ticker in tickers:
+            df = self.history(ticker, interval, period=period, start=start)
+            if not df.empty:
+                frames[ticker] = df
+        return frames
+
+    def constituents(self):
+        if self._constituents is None:
+            import pandas as pd
+            try:
+                self._constituents = pd.read_csv(os.path.join(self.directory, 'constituents.csv')).to_dict('records')
+            except (OSError, ValueError) as e:
+                print(f"Error reading recorded constituents: {str(e)}")
+                return None
+        return [dict(stock) for stock in self._constituents]
+
+def _window(period, start):
+    return {'period': period} if start is None else {'start': start}
+
+_recorded = {}
+
+def _replay_dir():
+    spec = Config.DATA_SOURCE
+    if spec == 'live':
+        return None
+    if spec.startswith('recorded:'):
+        return spec[len('recorded:'):]
+    raise ValueError(f"Unknown data source {spec!r}, expected 'live' or 'recorded:<dir>'")
+
+def _recorded_source(directory):
+    # Shared so every collector in the process reads the fixture from memory
+    return _recorded.setdefault(directory, RecordedSource(directory))
+
+def price_source():
+    directory = _replay_dir()
+    return _recorded_source(directory) if directory else YahooSource()
+
+def constituent_source():
+    directory = _replay_dir()
+    return _recorded_source(directory) if directory else WikipediaSource()
+
+def record(directory):
+    """Capture the live constituents and their price history into a fixture directory"""
+    import pandas as pd
+    from data_collector import FTSEDataCollector
+
+    stocks = WikipediaSource().constituents()
+    if not stocks:
+        print("Wikipedia unavailable, recording the local constituents snapshot")
+        stocks = pd.read_csv(Config.CONSTITUENTS_PATH).to_dict('records')
+    os.makedirs(directory, exist_ok=True)
+    pd.DataFrame(stocks).to_csv(os.path.join(directory, 'constituents.csv'), index=False)
+
+    store = PriceStore(os.path.join(directory, 'prices', Config.INTERVAL))
+    collector = FTSEDataCollector(store=store, source=YahooSource())
+    frames = collector.get_many([stock['Ticker'] for stock in stocks], add_features=False)
+    return stocks, frames
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == 'record':
+        stocks, frames = record(sys.argv[2])
+        print(f"Recorded {len(stocks)} constituents and prices for {len(frames)} tickers to {sys.argv[2]}")
+    else:
+        print("Usage: python data_sources.py record DIR")
@@ -0,0 +1,152 @@
+import math
+import numpy as np
+from config import Config
+
+class IndicatorState:
+    """Streaming version of FTSEDataCollector._add_features for one ticker.
+
+    Holds just enough of the recent history (the rolling windows and the MACD EMA
+    sums) to produce the latest feature vector and to advance by one bar in O(1).
+    """
+
+    def __init__(self):
+        # Windows in bars of the configured interval
+        self.return_periods = {weeks: Config.bars(weeks) for weeks in Config.RETURN_WEEKS}
+        self.sma_window = Config.bars(Config.SMA_WEEKS)
+        self.rsi_window = Config.bars(Config.RSI_WEEKS)
+        self.signal_window = Config.bars(Config.MACD_SIGNAL_WEEKS)
+        self.volatility_window = Config.bars(Config.VOLATILITY_WEEKS)
+        self.ema_spans = [Config.bars(Config.MACD_FAST_WEEKS), Config.bars(Config.MACD_SLOW_WEEKS)]
+
+        self.count = 0
+        self.last_date = None
+        self.closes = []
+        self.padded = []
+        self.gains = []
+        self.losses = []
+        self.ema = {span: [0.0, 0.0] for span in self.ema_spans}
+        self.macd = []
+        self.returns = []
+
+    @classmethod
+    def from_closes(cls, closes, dates=None):
+        state = cls()
+        for i, close in enumerate(closes):
+            state.update(close, None if dates is None else dates[i])
+        return state
+
+    @staticmethod
+    def _push(values, value, maxlen):
+        values.append(value)
+        del values[:-maxlen]
+
+    def update(self, close, date=None):
+        """Advance the state by one bar"""
+        close = float(close)
+        previous = self.closes[-1] if self.closes else None
+
+        # Returns use forward-filled closes, like the training features
+        if math.isnan(close) and self.padded:
+            padded = self.padded[-1]
+        else:
+            padded = close
+        if self.padded:
+            # return_1w over the configured interval
+            week = self.return_periods[1]
+            if len(self.padded) >= week:
+                value = float(np.float64(padded) / self.padded[-week] - 1)
+            else:
+                value = math.nan
+            self._push(self.returns, value, self.volatility_window)
+        else:
+            self._push(self.returns, math.nan, self.volatility_window)
+        self._push(self.padded, padded, max(self.return_periods.values()) + 1)
+
+        delta = 0.0 if previous is None else close - previous
+        self._push(self.gains, delta if delta > 0 else 0.0, self.rsi_window)
+        self._push(self.losses, -delta if delta < 0 else 0.0, self.rsi_window)
+        self._push(self.closes, close, self.sma_window)
+
+        valid = not math.isnan(close)
+        for span, sums in self.ema.items():
+            decay = 1 - 2 / (span + 1)
+            sums[0] = decay * sums[0] + (close if valid else 0.0)
+            sums[1] = decay * sums[1] + valid
+        fast, slow = (self.ema[span] for span in self.ema_spans)
+        macd = fast[0] / fast[1] - slow[0] / slow[1] if slow[1] > 0 else math.nan
+        self._push(self.macd, macd, self.signal_window)
+
+        self.count += 1
+        if date is not None:
+            self.last_date = str(date)
+
+    @staticmethod
+    def _full(values, window):
+        return len(values) == window and not any(math.isnan(v) for v in values)
+
+    def features(self):
+        """Feature values for the last bar, in Config.FEATURES order, with gaps as 0"""
+        values = {}
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for weeks, period in self.return_periods.items():
+                if len(self.padded) > period:
+                    values[f'return_{weeks}w'] = np.float64(self.padded[-1]) / self.padded[-1 - period] - 1
+                else:
+                    values[f'return_{weeks}w'] = math.nan
+
+        if self._full(self.closes, self.sma_window):
+            # Compare through differences so a flat window is not a crossover
+            values['sma_cross'] = float(sum(self.closes[-1] - c for c in self.closes) > 0)
+        else:
+            values['sma_cross'] = 0.0
+
+        if len(self.gains) == self.rsi_window:
+            rs = np.mean(self.gains) / (np.mean(self.losses) + 1e-9)
+            values['rsi'] = 100 - (100 / (1 + rs))
+        else:
+            values['rsi'] = math.nan
+
+        if self._full(self.macd, self.signal_window):
+            values['macd_signal'] = float(sum(self.macd[-1] - m for m in self.macd) > 0)
+        else:
+            values['macd_signal'] = 0.0
+
+        if self._full(self.returns, self.volatility_window):
+            values['volatility'] = np.std(self.returns, ddof=1)
+        else:
+            values['volatility'] = math.nan
+
+        return [0.0 if math.isnan(values[name]) else float(values[name]) for name in Config.FEATURES]
+
+    def features_after(self, close):
+        """Features as if close were appended, without changing this state"""
+        state = IndicatorState.from_dict(self.to_dict())
+        state.update(close)
+        return state.features()
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'last_date': self.last_date,
+            'closes': self.closes,
+            'padded': self.padded,
+            'gains': self.gains,
+            'losses': self.losses,
+            'ema': {str(span): sums for span, sums in self.ema.items()},
+            'macd': self.macd,
+            'returns': self.returns
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        state = cls()
+        state.count = data['count']
+        state.last_date = data['last_date']
+        state.closes = list(data['closes'])
+        state.padded = list(data['padded'])
+        state.gains = list(data['gains'])
+        state.losses = list(data['losses'])
+        state.ema = {int(span): list(sums) for span, sums in data['ema'].items()}
+        state.macd = list(data['macd'])
+        state.returns = list(data['returns'])
+        return state
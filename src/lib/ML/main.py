@@ -1,8 +1,17 @@
 import sys
 import json
+import time
+import signal
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime, timedelta
 from predictor import StockPredictor
-from scraper import company_by_industry
+from scraper import industry_companies
+from prediction_table import get_prediction_table
+from portfolio_cache import PortfolioCache
+from config import Config
+from metrics import metrics, profile
 import traceback
 import logging
 
@@ -16,6 +25,116 @@ logging.basicConfig(
     ]
 )
 
+# Predictor shared by every request served by this process
+_predictor = None
+_predictor_lock = threading.Lock()
+
+WORKER_THREADS = 8
+
+def get_predictor():
+    """Return the process-wide predictor, loading the model on first use"""
+    global _predictor
+    if _predictor is None:
+        with _predictor_lock:
+            if _predictor is None:
+                _predictor = StockPredictor()
+    return _predictor
+
+def reload_predictor():
+    """Load a fresh predictor and swap it in once it is ready"""
+    global _predictor
+    logging.info("Reloading stock predictor")
+    new_predictor = StockPredictor()
+    if new_predictor.model_data is None:
+        logging.error("Reload failed: model not available, keeping current predictor")
+        return False
+    # Requests already running keep the predictor they started with
+    with _predictor_lock:
+        _predictor = new_predictor
+    logging.info("Stock predictor reloaded")
+    return True
+
+# Threads fetching the latest features of live requests, shared by every request
+_fanout_pool = ThreadPoolExecutor(max_workers=Config.PREDICTION_FANOUT_WORKERS)
+
+def fetch_groups(tickers):
+    """Split tickers into groups that one fan-out thread reads and downloads together.
+    Groups are kept small so a timeout drops few tickers."""
+    size = -(-len(tickers) // Config.FANOUT_GROUPS_PER_REQUEST)
+    size = max(1, min(Config.FANOUT_GROUP_SIZE, size))
+    return [tickers[i:i + size] for i in range(0, len(tickers), size)]
+
+def score_as_completed(predictor, tickers):
+    """Fetch features for tickers in groups on the fan-out pool, score each finished group
+    with one model call and yield (ticker, prediction) once per ticker as groups finish.
+    A group that raises, runs past FETCH_GROUP_TIMEOUT_SECONDS or has not finished at
+    the request deadline yields None for its tickers, and groups not started by then
+    are cancelled. A timed-out group no longer holds one of the request's slots, so the
+    rest of its tickers keep being fetched."""
+    model_data = predictor.model_data
+    deadline = time.monotonic() + Config.REQUEST_DEADLINE_SECONDS
+    queued = deque(fetch_groups(list(tickers)))
+    running = {}
+
+    def fetch(group, clock):
+        clock.append(time.monotonic())
+        return predictor.latest_features(group)
+
+    def dropped(group, counter, reason):
+        metrics.count(counter, len(group))
+        logging.warning(f"Dropped {', '.join(group)}: {reason}")
+        return [(ticker, None) for ticker in group]
+
+    while queued or running:
+        while queued and len(running) < Config.FANOUT_GROUPS_PER_REQUEST:
+            group, clock = queued.popleft(), []
+            running[_fanout_pool.submit(fetch, group, clock)] = (group, clock)
+
+        now = time.monotonic()
+        if now >= deadline:
+            for future, (group, _) in running.items():
+                future.cancel()
+                yield from dropped(group, 'ticker_dropped_deadline', "request deadline exceeded")
+            for group in queued:
+                yield from dropped(group, 'ticker_dropped_deadline', "request deadline exceeded")
+            return
+
+        # Wake up at the deadline, when the earliest running group times out or one finishes
+        wake = deadline
+        for _, clock in running.values():
+            if clock:
+                wake = min(wake, clock[0] + Config.FETCH_GROUP_TIMEOUT_SECONDS)
+        done, _ = wait(running, timeout=max(0, wake - now), return_when=FIRST_COMPLETED)
+
+        for future in done:
+            group, _ = running.pop(future)
+            try:
+                scored = predictor.predict_latest(future.result(), model_data)
+            except Exception as e:
+                logging.error(traceback.format_exc())
+                yield from dropped(group, 'ticker_dropped_error', str(e))
+                continue
+            for ticker in group:
+                prediction = scored.get(ticker)
+                if prediction is None:
+                    metrics.count('ticker_dropped_no_data')
+                    logging.warning(f"Dropped {ticker}: no price data available")
+                yield ticker, prediction
+
+        now = time.monotonic()
+        for future, (group, clock) in list(running.items()):
+            if clock and now - clock[0] >= Config.FETCH_GROUP_TIMEOUT_SECONDS:
+                # The fetch keeps its pool thread until its Yahoo call gives up
+                del running[future]
+                yield from dropped(group, 'ticker_dropped_timeout',
+                                   f"timed out after {Config.FETCH_GROUP_TIMEOUT_SECONDS}s")
+
+def predict_concurrently(predictor, tickers):
+    """Score tickers in parallel fetch groups, dropping any whose group fails, times
+    out or is still running at the request deadline"""
+    return {ticker: prediction for ticker, prediction in score_as_completed(predictor, tickers)
+            if prediction is not None}
+
 def validate_input(data):
     """Validate input data and return error message if invalid"""
     try:
@@ -43,148 +162,478 @@ def validate_input(data):
     except Exception as e:
         return f"Validation error: {str(e)}"
 
+def prepare_request(data):
+    """Validate a request and find its companies.
+    Returns (plan, None), or (None, error response) if it cannot be answered."""
+    error = validate_input(data)
+    if error:
+        logging.error(f"Input validation failed: {error}")
+        return None, {
+            "success": False,
+            "error": error
+        }
+
+    # Parse input data
+    amount = float(data['investment_amount'])
+    risk = float(data['risk_tolerance'])
+    industry = data.get('industry', 'General')
+    
+    logging.info(f"Processing request - Amount: {amount}, Risk: {risk}, Industry: {industry}")
+
+    # Get matching companies
+    logging.info(f"Fetching companies for industry: {industry}")
+    with metrics.time('constituents'):
+        matching_companies, constituents = industry_companies(industry)
+    if not matching_companies:
+        logging.warning(f"No companies found for industry: {industry}")
+        return None, {
+            "success": False,
+            "error": f"No companies found in {industry} industry"
+        }
+
+    plan = {
+        'amount': amount,
+        'risk': risk,
+        'industry': industry,
+        'companies': matching_companies,
+        'constituents': constituents
+    }
+    return plan, None
+
+def ready_predictor():
+    """The shared predictor with the newest model swapped in and pinned for this request,
+    or None if no model is available"""
+    logging.info("Initializing stock predictor")
+    with metrics.time('model_refresh'):
+        predictor = get_predictor()
+        predictor.refresh_model()
+        predictor = predictor.pinned()
+    if predictor.model_data is None:
+        logging.error("Model not available")
+        return None
+    return predictor
+
+def usable_prediction_table(predictor):
+    """The precomputed prediction table if it was made by the serving model, else None"""
+    table = get_prediction_table()
+    if table is not None and table.is_usable(predictor.model_version):
+        logging.info(f"Using prediction table generated by model {table.model_version}")
+        metrics.count('prediction_table_hit')
+        return table
+    logging.info("Prediction table unavailable or stale, scoring live")
+    metrics.count('prediction_table_miss')
+    return None
+
+def select_stocks(plan, scored):
+    """The stocks a prepared request would buy from {ticker: prediction}, which does not
+    depend on the amount. Returns {'risk_level', 'stocks'}, with no stocks if none are positive."""
+    predictions = []
+    for company in plan['companies']:
+        try:
+            prediction = scored.get(company['Ticker'])
+            if prediction is not None:
+                predicted_return = float(prediction['predicted_return'])
+                if predicted_return > 0:  # Only include positive returns
+                    # Plain floats keep the rounding in allocate() cheap on every repeat
+                    predictions.append({
+                        'company': company['Company'],
+                        'ticker': company['Ticker'],
+                        'industry': company['Industry'],
+                        'current_price': float(prediction['current_price']),
+                        'predicted_price': float(prediction['predicted_price']),
+                        'predicted_return': predicted_return
+                    })
+        except Exception as e:
+            logging.warning(f"Failed to process prediction for {company['Ticker']}: {str(e)}")
+            continue
+
+    # Determine portfolio size based on risk
+    logging.info("Determining portfolio size based on risk level")
+    level = Config.risk_level(plan['risk'])
+    num_stocks = min(Config.RISK_LEVELS[level]['stocks'], len(predictions))
+
+    # Select top performing stocks
+    selected_stocks = sorted(
+        predictions, 
+        key=lambda x: x['predicted_return'], 
+        reverse=True
+    )[:num_stocks]
+    return {'risk_level': level.title(), 'stocks': selected_stocks}
+
+def allocate(amount, selection):
+    """Portfolio response investing amount equally across a selection"""
+    started = time.perf_counter()
+    selected_stocks = selection['stocks']
+    if not selected_stocks:
+        logging.warning("No positive predictions available")
+        return {
+            "success": False,
+            "error": "No positive predictions available for this industry"
+        }
+
+    # Calculate portfolio allocation
+    logging.info("Calculating portfolio allocation")
+    allocation_per_stock = amount / len(selected_stocks)
+    total_predicted_return = 0
+    total_predicted_value = 0
+    portfolio = []
+
+    for stock in selected_stocks:
+        shares = allocation_per_stock / stock['current_price']
+        predicted_gain = (stock['predicted_price'] - stock['current_price']) * shares
+        total_predicted_return += predicted_gain
+        total_predicted_value += (shares * stock['predicted_price'])
+
+        portfolio.append({
+            'company': stock['company'],
+            'ticker': stock['ticker'],
+            'industry': stock['industry'],
+            'allocation': round(allocation_per_stock, 2),
+            'shares': round(shares, 2),
+            'current_price': round(stock['current_price'], 2),
+            'predicted_price': round(stock['predicted_price'], 2),
+            'predicted_return': round(stock['predicted_return'] * 100, 2),
+            'predicted_gain': round(predicted_gain, 2)
+        })
+
+    # Prepare response
+    result = {
+        "success": True,
+        "risk_level": selection['risk_level'],
+        "portfolio": portfolio,
+        "summary": {
+            "initial_investment": round(amount, 2),
+            "number_of_stocks": len(portfolio),
+            "allocation_per_stock": round(allocation_per_stock, 2),
+            "total_predicted_gain": round(total_predicted_return, 2),
+            "predicted_portfolio_value": round(total_predicted_value, 2),
+            "total_return_percentage": round((total_predicted_value - amount) / amount * 100, 2),
+            "rebalance_date": (datetime.now() + timedelta(days=30)).strftime('%Y-%m-%d')
+        }
+    }
+
+    metrics.observe('portfolio', time.perf_counter() - started)
+    logging.info("Successfully generated portfolio recommendation")
+    return result
+
+# Selections of recent requests, rescaled to the amount of each repeat
+_portfolio_cache = PortfolioCache()
+
+def cached_selection(plan, predictor, table):
+    """The cached selection for a request answered by this model and table, or None"""
+    key = _portfolio_cache.key(plan['industry'], Config.risk_level(plan['risk']), predictor.model_version, table,
+                               plan['constituents'])
+    selection = _portfolio_cache.get(key)
+    metrics.count('portfolio_cache_hit' if selection is not None else 'portfolio_cache_miss')
+    return selection
+
+def remember_selection(plan, predictor, table, scored, selection):
+    """Cache a selection, unless live scoring dropped tickers that may score next time"""
+    if table is None:
+        _portfolio_cache.note_scored(scored)
+        if any(company['Ticker'] not in scored for company in plan['companies']):
+            return
+    key = _portfolio_cache.key(plan['industry'], Config.risk_level(plan['risk']), predictor.model_version, table,
+                               plan['constituents'])
+    _portfolio_cache.put(key, selection, live=table is None)
+
 def process_investment_data(data):
     """Process investment data and generate portfolio recommendations"""
+    started = time.perf_counter()
     try:
         logging.info("Starting investment data processing")
         
-        # Validate input
-        error = validate_input(data)
+        plan, error = prepare_request(data)
         if error:
-            logging.error(f"Input validation failed: {error}")
+            return error
+
+        predictor = ready_predictor()
+        if predictor is None:
             return {
                 "success": False,
-                "error": error
+                "error": "Model not available"
             }
 
-        # Parse input data
-        amount = float(data['investment_amount'])
-        risk = float(data['risk_tolerance'])
-        industry = data.get('industry', 'General')
-        
-        logging.info(f"Processing request - Amount: {amount}, Risk: {risk}, Industry: {industry}")
+        table = usable_prediction_table(predictor)
+        selection = cached_selection(plan, predictor, table)
+        if selection is None:
+            # Get predictions for matching companies
+            logging.info("Making predictions for matching companies")
+            tickers = [company['Ticker'] for company in plan['companies']]
+            with metrics.time('predictions'):
+                if table is not None:
+                    scored = table.lookup(tickers)
+                else:
+                    scored = predict_concurrently(predictor, tickers)
+            selection = select_stocks(plan, scored)
+            remember_selection(plan, predictor, table, scored, selection)
 
-        # Get matching companies
-        logging.info(f"Fetching companies for industry: {industry}")
-        matching_companies = company_by_industry(industry)
-        if not matching_companies:
-            logging.warning(f"No companies found for industry: {industry}")
-            return {
-                "success": False,
-                "error": f"No companies found in {industry} industry"
-            }
+        return allocate(plan['amount'], selection)
 
-        # Initialize predictor
-        logging.info("Initializing stock predictor")
-        predictor = StockPredictor()
-        if predictor.model_data is None:
-            logging.error("Model not available")
-            return {
-                "success": False,
-                "error": "Model not available"
-            }
+    except Exception as e:
+        metrics.count('request_error')
+        logging.error(f"Error in process_investment_data: {str(e)}")
+        logging.error(traceback.format_exc())
+        return {
+            "success": False,
+            "error": str(e)
+        }
+    finally:
+        metrics.observe('request', time.perf_counter() - started)
+
+def process_investment_batch(requests, emit):
+    """Answer many requests, fetching and scoring the union of their tickers only once.
+    emit(index, response) is called for each request as soon as every ticker it needs
+    has been scored, so early requests are not held back by later ones."""
+    started = time.perf_counter()
+    answered = set()
+
+    def answer(index, response):
+        answered.add(index)
+        emit(index, response)
 
-        # Get predictions for matching companies
-        logging.info("Making predictions for matching companies")
-        predictions = []
-        for company in matching_companies:
+    try:
+        logging.info(f"Starting batch of {len(requests)} requests")
+        plans = {}
+        for index, data in enumerate(requests):
             try:
-                prediction = predictor.predict_stock(company['Ticker'])
-                if prediction is not None:
-                    predicted_return = prediction['predicted_return']
-                    if predicted_return > 0:  # Only include positive returns
-                        predictions.append({
-                            'company': company['Company'],
-                            'ticker': company['Ticker'],
-                            'industry': company['Industry'],
-                            'current_price': prediction['current_price'],
-                            'predicted_price': prediction['predicted_price'],
-                            'predicted_return': predicted_return
-                        })
+                plan, error = prepare_request(data)
             except Exception as e:
-                logging.warning(f"Failed to process prediction for {company['Ticker']}: {str(e)}")
-                continue
+                plan, error = None, {"success": False, "error": str(e)}
+            if error:
+                answer(index, error)
+            else:
+                plans[index] = plan
+        if not plans:
+            return
 
-        if not predictions:
-            logging.warning("No positive predictions available")
-            return {
-                "success": False,
-                "error": "No positive predictions available for this industry"
-            }
+        predictor = ready_predictor()
+        if predictor is None:
+            for index in plans:
+                answer(index, {"success": False, "error": "Model not available"})
+            return
 
-        # Determine portfolio size based on risk
-        logging.info("Determining portfolio size based on risk level")
-        if risk > 7:
-            num_stocks = min(4, len(predictions))
-            risk_level = "High"
-        elif risk > 4:
-            num_stocks = min(6, len(predictions))
-            risk_level = "Medium"
-        else:
-            num_stocks = min(8, len(predictions))
-            risk_level = "Low"
-
-        # Select top performing stocks
-        selected_stocks = sorted(
-            predictions, 
-            key=lambda x: x['predicted_return'], 
-            reverse=True
-        )[:num_stocks]
-
-        # Calculate portfolio allocation
-        logging.info("Calculating portfolio allocation")
-        allocation_per_stock = amount / len(selected_stocks)
-        total_predicted_return = 0
-        total_predicted_value = 0
-        portfolio = []
-
-        for stock in selected_stocks:
-            shares = allocation_per_stock / stock['current_price']
-            predicted_gain = (stock['predicted_price'] - stock['current_price']) * shares
-            total_predicted_return += predicted_gain
-            total_predicted_value += (shares * stock['predicted_price'])
-
-            portfolio.append({
-                'company': stock['company'],
-                'ticker': stock['ticker'],
-                'industry': stock['industry'],
-                'allocation': round(allocation_per_stock, 2),
-                'shares': round(shares, 2),
-                'current_price': round(stock['current_price'], 2),
-                'predicted_price': round(stock['predicted_price'], 2),
-                'predicted_return': round(stock['predicted_return'] * 100, 2),
-                'predicted_gain': round(predicted_gain, 2)
-            })
-
-        # Prepare response
-        result = {
-            "success": True,
-            "risk_level": risk_level,
-            "portfolio": portfolio,
-            "summary": {
-                "initial_investment": round(amount, 2),
-                "number_of_stocks": len(portfolio),
-                "allocation_per_stock": round(allocation_per_stock, 2),
-                "total_predicted_gain": round(total_predicted_return, 2),
-                "predicted_portfolio_value": round(total_predicted_value, 2),
-                "total_return_percentage": round((total_predicted_value - amount) / amount * 100, 2),
-                "rebalance_date": (datetime.now() + timedelta(days=30)).strftime('%Y-%m-%d')
-            }
-        }
+        # Repeats of recent requests are answered without scoring anything
+        table = usable_prediction_table(predictor)
+        for index in list(plans):
+            selection = cached_selection(plans[index], predictor, table)
+            if selection is not None:
+                answer(index, allocate(plans.pop(index)['amount'], selection))
+        if not plans:
+            return
+
+        # Requests waiting on each ticker, with tickers in the order they are first needed
+        waiting = {}
+        for index, plan in plans.items():
+            for company in plan['companies']:
+                waiting.setdefault(company['Ticker'], set()).add(index)
+        outstanding = {index: len({c['Ticker'] for c in plan['companies']}) for index, plan in plans.items()}
+        metrics.count('batch_tickers_shared', sum(outstanding.values()) - len(waiting))
+        logging.info(f"Scoring {len(waiting)} distinct tickers for {len(plans)} requests")
+
+        if table is not None:
+            scored = table.lookup(list(waiting))
+            for index, plan in plans.items():
+                answer(index, _portfolio_or_error(plan, predictor, table, scored))
+            return
 
-        logging.info("Successfully generated portfolio recommendation")
-        return result
+        scored = {}
+        for ticker, prediction in score_as_completed(predictor, list(waiting)):
+            if prediction is not None:
+                scored[ticker] = prediction
+            for index in sorted(waiting[ticker]):
+                outstanding[index] -= 1
+                if outstanding[index] == 0:
+                    answer(index, _portfolio_or_error(plans[index], predictor, table, scored))
 
     except Exception as e:
-        logging.error(f"Error in process_investment_data: {str(e)}")
+        metrics.count('request_error')
+        logging.error(f"Error in process_investment_batch: {str(e)}")
         logging.error(traceback.format_exc())
+        for index in range(len(requests)):
+            if index not in answered:
+                answer(index, {"success": False, "error": str(e)})
+    finally:
+        metrics.observe('batch', time.perf_counter() - started)
+
+def _portfolio_or_error(plan, predictor, table, scored):
+    try:
+        selection = select_stocks(plan, scored)
+        remember_selection(plan, predictor, table, scored, selection)
+        return allocate(plan['amount'], selection)
+    except Exception as e:
+        logging.error(f"Error building portfolio: {str(e)}")
+        return {"success": False, "error": str(e)}
+
+class PredictionWorker:
+    """Long-lived worker answering newline-delimited JSON requests on stdin"""
+
+    def __init__(self, stdin, stdout, threads=WORKER_THREADS):
+        self.stdin = stdin
+        self.stdout = stdout
+        self.pool = ThreadPoolExecutor(max_workers=threads)
+        self.write_lock = threading.Lock()
+        self.started = time.time()
+        self.requests_served = 0
+        self.in_flight = 0
+        self.counter_lock = threading.Lock()
+        self.shutting_down = False
+
+    def send(self, message):
+        with self.write_lock:
+            self.stdout.write(json.dumps(message) + "\n")
+            self.stdout.flush()
+
+    def health(self):
+        predictor = _predictor
+        version, model_data = predictor.current if predictor is not None else (None, None)
         return {
-            "success": False,
-            "error": str(e)
+            "success": True,
+            "status": "ok" if model_data is not None else "degraded",
+            "model_loaded": model_data is not None,
+            "model_version": version,
+            "uptime_seconds": round(time.time() - self.started, 1),
+            "requests_served": self.requests_served,
+            "in_flight": self.in_flight
         }
 
+    def handle(self, request_id, data):
+        with self.counter_lock:
+            self.in_flight += 1
+        try:
+            command = data.get('command')
+            if command == 'reload':
+                result = {"success": reload_predictor()}
+            elif command == 'batch':
+                # One message per request as it is answered, tagged with its index
+                requests = data.get('requests')
+                if not isinstance(requests, list):
+                    raise ValueError("batch needs a list of requests")
+
+                def emit(index, response):
+                    response["id"] = request_id
+                    response["index"] = index
+                    self.send(response)
+
+                process_investment_batch(requests, emit)
+                result = {"success": True, "done": True, "count": len(requests)}
+            elif command == 'metrics':
+                if data.get('format') == 'prometheus':
+                    result = {"success": True, "format": "prometheus", "metrics": metrics.prometheus()}
+                else:
+                    result = {"success": True, "format": "json", "metrics": metrics.snapshot()}
+            elif data.get('profile') and Config.PROFILE_REQUESTS:
+                # cProfile the request thread and return the hottest calls with the answer
+                result, stats = profile(process_investment_data, data)
+                result["profile"] = stats
+            else:
+                result = process_investment_data(data)
+        except Exception as e:
+            logging.error(f"Worker request failed: {str(e)}")
+            logging.error(traceback.format_exc())
+            result = {"success": False, "error": str(e)}
+        finally:
+            with self.counter_lock:
+                self.in_flight -= 1
+                self.requests_served += 1
+        result["id"] = request_id
+        self.send(result)
+
+    def reload_on_signal(self, signum, frame):
+        """SIGHUP handler: reload the model in the background unless the worker is stopping"""
+        if self.shutting_down:
+            return
+        try:
+            self.pool.submit(reload_predictor)
+        except RuntimeError:
+            # The pool shut down between the check and the submit
+            pass
+
+    def serve(self):
+        logging.info("Starting prediction worker")
+        get_predictor()
+        if hasattr(signal, 'SIGHUP'):
+            signal.signal(signal.SIGHUP, self.reload_on_signal)
+        self.send({"id": None, "success": True, "status": "ready"})
+
+        for line in self.stdin:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                data = json.loads(line)
+            except json.JSONDecodeError as e:
+                self.send({"id": None, "success": False, "error": f"Invalid JSON input: {str(e)}"})
+                continue
+            if not isinstance(data, dict):
+                self.send({"id": None, "success": False, "error": "Request must be a JSON object"})
+                continue
+            request_id = data.pop('id', None)
+            if data.get('command') == 'shutdown':
+                self.send({"id": request_id, "success": True, "status": "ok"})
+                break
+            if data.get('command') == 'health':
+                # Answered here, so a pool busy with slow requests still reports its state
+                self.send({**self.health(), "id": request_id})
+                continue
+            self.pool.submit(self.handle, request_id, data)
+
+        # Let in-flight requests finish before exiting
+        self.shutting_down = True
+        self.pool.shutdown(wait=True)
+        logging.info("Prediction worker stopped")
+
+def serve_worker():
+    """Run as a persistent worker speaking one JSON object per line"""
+    # Keep stray prints from the predictor out of the protocol stream
+    protocol_out = sys.stdout
+    sys.stdout = sys.stderr
+    PredictionWorker(sys.stdin, protocol_out).serve()
+
+def serve_batch():
+    """Answer every newline-delimited JSON request on stdin as one batch, writing one
+    line per request, with its id if it had one, as soon as it is ready"""
+    protocol_out = sys.stdout
+    sys.stdout = sys.stderr
+    write_lock = threading.Lock()
+
+    def send(message):
+        with write_lock:
+            protocol_out.write(json.dumps(message) + "\n")
+            protocol_out.flush()
+
+    requests = []
+    ids = []
+    for number, line in enumerate(sys.stdin, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            data = json.loads(line)
+        except json.JSONDecodeError as e:
+            send({"id": None, "line": number, "success": False, "error": f"Invalid JSON input: {str(e)}"})
+            continue
+        if not isinstance(data, dict):
+            send({"id": None, "line": number, "success": False, "error": "Request must be a JSON object"})
+            continue
+        ids.append(data.pop('id', len(ids)))
+        requests.append(data)
+
+    def emit(index, response):
+        response["id"] = ids[index]
+        send(response)
+
+    process_investment_batch(requests, emit)
+
 def main():
     """Main entry point for the script"""
+    if '--worker' in sys.argv[1:]:
+        serve_worker()
+        return
+    if '--batch' in sys.argv[1:]:
+        serve_batch()
+        return
+
     try:
         logging.info("Starting portfolio prediction process")
         
@@ -210,7 +659,11 @@ def main():
             return
 
         # Process data and return result
-        result = process_investment_data(data)
+        if '--profile' in sys.argv[1:]:
+            result, stats = profile(process_investment_data, data)
+            sys.stderr.write(stats)
+        else:
+            result = process_investment_data(data)
         print(json.dumps(result), flush=True)
 
     except Exception as e:
@@ -0,0 +1,101 @@
+import io
+import time
+import pstats
+import cProfile
+import threading
+import contextlib
+
+# Upper bounds in seconds of the latency histogram buckets
+BUCKETS = [0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]
+
+class Metrics:
+    """Per-stage latency histograms and event counters shared by every thread in the process"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.stages = {}
+            self.counters = {}
+            self.started = time.time()
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            timing = self.stages.get(stage)
+            if timing is None:
+                timing = self.stages[stage] = {'count': 0, 'sum': 0.0, 'max': 0.0, 'buckets': [0] * len(BUCKETS)}
+            timing['count'] += 1
+            timing['sum'] += seconds
+            timing['max'] = max(timing['max'], seconds)
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    timing['buckets'][i] += 1
+                    break
+
+    @contextlib.contextmanager
+    def time(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def snapshot(self):
+        """Stage timings in milliseconds and counters, ready for json.dumps"""
+        with self.lock:
+            stages = {}
+            for stage, timing in sorted(self.stages.items()):
+                stages[stage] = {
+                    'count': timing['count'],
+                    'total_ms': round(timing['sum'] * 1000, 3),
+                    'mean_ms': round(timing['sum'] * 1000 / timing['count'], 3),
+                    'max_ms': round(timing['max'] * 1000, 3)
+                }
+            return {
+                'uptime_seconds': round(time.time() - self.started, 1),
+                'stages': stages,
+                'counters': dict(sorted(self.counters.items()))
+            }
+
+    def prometheus(self):
+        """The same data in the Prometheus text exposition format"""
+        with self.lock:
+            lines = [
+                '# HELP ftse_stage_seconds Time spent in each prediction pipeline stage',
+                '# TYPE ftse_stage_seconds histogram'
+            ]
+            for stage, timing in sorted(self.stages.items()):
+                cumulative = 0
+                for bound, n in zip(BUCKETS, timing['buckets']):
+                    cumulative += n
+                    lines.append(f'ftse_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'ftse_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {timing["count"]}')
+                lines.append(f'ftse_stage_seconds_sum{{stage="{stage}"}} {timing["sum"]:.6f}')
+                lines.append(f'ftse_stage_seconds_count{{stage="{stage}"}} {timing["count"]}')
+
+            lines.append('# HELP ftse_events_total Cache hits and misses, failures and other events')
+            lines.append('# TYPE ftse_events_total counter')
+            for name, value in sorted(self.counters.items()):
+                lines.append(f'ftse_events_total{{event="{name}"}} {value}')
+            return '\n'.join(lines) + '\n'
+
+# Collected by the data collector, predictor and request handler. Stages are
+# constituents, model_refresh, predictions, portfolio and request per request,
+# state_lookup and features per ticker, fetch_batch and download per fetch group,
+# and scaling and inference per scoring call.
+metrics = Metrics()
+
+def profile(func, *args, limit=30, **kwargs):
+    """Call func under cProfile and return (result, top functions by cumulative time).
+    Only the calling thread is profiled; work fanned out to pools shows up in the stage timings."""
+    profiler = cProfile.Profile()
+    result = profiler.runcall(func, *args, **kwargs)
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(limit)
+    return result, out.getvalue()
@@ -0,0 +1,167 @@
+import os
+import sys
+import json
+import struct
+import zipfile
+import numpy as np
+from random_forest import RandomForest
+
+# Bump when the layout of the arrays or the header changes. Version 2 folds the
+# scaler into the thresholds and stores no scaler arrays.
+FORMAT_VERSION = 2
+READABLE_FORMATS = (1, 2)
+TREE_ARRAYS = ('feature', 'threshold', 'left', 'right', 'value', 'roots')
+
+class ArrayScaler:
+    """Applies a fitted StandardScaler from its mean_ and scale_ arrays"""
+
+    def __init__(self, mean, scale):
+        self.mean_ = mean
+        self.scale_ = scale
+
+    def transform(self, X):
+        return (np.asarray(X, dtype=np.float64) - self.mean_) / self.scale_
+
+def fold_scaler(model, scaler):
+    """Return a predict-only copy of the forest whose thresholds apply to raw features.
+    Each threshold becomes the largest raw value that the scaler maps to at most the
+    original one, so every split decision matches scaling first."""
+    if getattr(model, 'roots', None) is None:
+        model.compile()
+    mean = np.asarray(scaler.mean_, dtype=np.float64)
+    scale = np.asarray(scaler.scale_, dtype=np.float64)
+
+    threshold = np.array(model.threshold, dtype=np.float64)
+    split = np.isfinite(threshold)
+    t = threshold[split]
+    m = mean[model.feature[split]]
+    s = scale[model.feature[split]]
+    raw = t * s + m
+
+    # Rounding can leave raw a few ulps either side of the boundary, step it back onto it
+    for _ in range(64):
+        high = (raw - m) / s > t
+        if not high.any():
+            break
+        raw[high] = np.nextafter(raw[high], -np.inf)
+    for _ in range(64):
+        up = np.nextafter(raw, np.inf)
+        fits = (up - m) / s <= t
+        if not fits.any():
+            break
+        raw[fits] = up[fits]
+    threshold[split] = raw
+
+    folded = RandomForest.from_arrays(model.feature, threshold, model.left, model.right, model.value,
+                                      model.roots, model.depth, max_depth=model.max_depth)
+    folded.tree_trained_at = getattr(model, 'tree_trained_at', None)
+    return folded
+
+def save_model(path, model, scaler, features, metrics, **info):
+    """Write the flattened forest, features and metrics to one .npz file.
+    The scaler is folded into the thresholds, so the saved forest scores raw features;
+    pass None if the forest already does."""
+    if scaler is not None:
+        model = fold_scaler(model, scaler)
+    elif getattr(model, 'roots', None) is None:
+        model.compile()
+
+    header = {
+        'format_version': FORMAT_VERSION,
+        'features': list(features),
+        'metrics': {name: float(value) for name, value in metrics.items()},
+        'n_trees': len(model.roots),
+        'max_depth': model.max_depth,
+        'depth': int(model.depth),
+        **info
+    }
+    # Per-tree training times let warm starts retire the oldest trees
+    if getattr(model, 'tree_trained_at', None) is not None:
+        header['tree_trained_at'] = list(model.tree_trained_at)
+    arrays = {name: np.ascontiguousarray(getattr(model, name)) for name in TREE_ARRAYS}
+
+    # Stored uncompressed so the arrays can be memory-mapped straight from the file
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, header=np.frombuffer(json.dumps(header).encode(), dtype=np.uint8), **arrays)
+    os.replace(tmp_path, path)
+
+def _map_arrays(path):
+    """Memory-map every member of an uncompressed .npz without copying it"""
+    arrays = {}
+    with open(path, 'rb') as f, zipfile.ZipFile(f) as archive:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{info.filename} is compressed and cannot be memory-mapped")
+            # Member data starts after its local file header
+            f.seek(info.header_offset)
+            local_header = f.read(30)
+            name_length, extra_length = struct.unpack('<HH', local_header[26:30])
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            name = info.filename[:-len('.npy')]
+            if int(np.prod(shape)) == 0:
+                arrays[name] = np.empty(shape, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(path, dtype=dtype, mode='r', offset=f.tell(), shape=shape,
+                                         order='F' if fortran_order else 'C')
+    return arrays
+
+def load_model(path, mmap=True):
+    """Load a model saved by save_model in the same dict layout as the pickled models"""
+    if mmap:
+        arrays = _map_arrays(path)
+    else:
+        with np.load(path) as npz:
+            arrays = {name: npz[name] for name in npz.files}
+
+    header = json.loads(bytes(arrays.pop('header')).decode())
+    if header.get('format_version') not in READABLE_FORMATS:
+        raise ValueError(f"Unsupported model format version: {header.get('format_version')}")
+
+    model = RandomForest.from_arrays(
+        *(arrays[name] for name in TREE_ARRAYS),
+        depth=header['depth'],
+        max_depth=header['max_depth']
+    )
+    # Files without per-tree times date every tree to when the model was trained
+    model.tree_trained_at = header.get('tree_trained_at') or [header.get('trained_at')] * len(model.roots)
+    return {
+        'model': model,
+        # Only version 1 files keep a separate scaler
+        'scaler': ArrayScaler(arrays['scaler_mean'], arrays['scaler_scale']) if 'scaler_mean' in arrays else None,
+        'features': header['features'],
+        'metrics': header['metrics'],
+        'header': header
+    }
+
+def convert_pickle(pickle_path, output_path, features):
+    """Rewrite a pickled model dict from train_model.py in the .npz format"""
+    import pickle
+    with open(pickle_path, 'rb') as f:
+        model_data = pickle.load(f)
+    save_model(output_path, model_data['model'], model_data['scaler'], features, model_data['metrics'])
+
+def export_model(input_path, output_path):
+    """Rewrite a saved .npz, such as a version 1 file with a separate scaler, in the current format"""
+    model_data = load_model(input_path, mmap=False)
+    info = {k: v for k, v in model_data['header'].items()
+            if k not in ('format_version', 'features', 'metrics', 'n_trees', 'max_depth', 'depth', 'tree_trained_at')}
+    save_model(output_path, model_data['model'], model_data['scaler'], model_data['features'],
+               model_data['metrics'], **info)
+
+if __name__ == "__main__":
+    from config import Config
+    if len(sys.argv) != 3:
+        print("Usage: python model_io.py <model.pkl|model.npz> <model.npz>")
+        sys.exit(1)
+    if sys.argv[1].endswith('.npz'):
+        export_model(sys.argv[1], sys.argv[2])
+    else:
+        convert_pickle(sys.argv[1], sys.argv[2], Config.FEATURES)
+    print(f"Saved {sys.argv[2]}")
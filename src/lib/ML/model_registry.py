@@ -0,0 +1,89 @@
+import os
+import json
+import threading
+from datetime import datetime
+from config import Config
+from model_io import FORMAT_VERSION, READABLE_FORMATS, save_model, load_model
+
+class ModelRegistry:
+    """Directory of saved models with a manifest.json describing every version"""
+
+    MANIFEST = 'manifest.json'
+
+    def __init__(self, root=None):
+        self.root = root or Config.MODEL_REGISTRY_DIR
+        self.manifest_path = os.path.join(self.root, self.MANIFEST)
+        self.lock = threading.Lock()
+
+    def entries(self):
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f).get('models', [])
+        except (OSError, ValueError):
+            return []
+
+    def manifest_mtime(self):
+        try:
+            return os.stat(self.manifest_path).st_mtime
+        except OSError:
+            return None
+
+    def _write_manifest(self, entries):
+        # Replace the manifest atomically so readers never see a partial file
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'models': entries}, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def register(self, model, scaler, features, metrics, trained_at=None, interval='1wk', horizon_weeks=1,
+                 params=None, base_version=None):
+        """Save a trained model into the registry and add it to the manifest.
+        params records the forest settings it was trained with, and base_version the
+        model a warm start grew it from."""
+        trained_at = trained_at or datetime.now()
+        version = trained_at.strftime('%Y%m%d%H%M%S')
+        filename = f'model_{version}.npz'
+
+        os.makedirs(self.root, exist_ok=True)
+        save_model(os.path.join(self.root, filename), model, scaler, features, metrics,
+                   version=version, trained_at=trained_at.isoformat(),
+                   interval=interval, horizon_weeks=horizon_weeks, params=params,
+                   base_version=base_version)
+
+        entry = {
+            'version': version,
+            'file': filename,
+            'trained_at': trained_at.isoformat(),
+            'format_version': FORMAT_VERSION,
+            'features': list(features),
+            'interval': interval,
+            'horizon_weeks': horizon_weeks,
+            'params': params,
+            'base_version': base_version,
+            'metrics': {name: float(value) for name, value in metrics.items()}
+        }
+        with self.lock:
+            entries = [e for e in self.entries() if e['version'] != version]
+            entries.append(entry)
+            self._write_manifest(entries)
+        return entry
+
+    def latest(self, features=None, interval=None):
+        """Return the newest entry whose file exists and, if given, was trained on these
+        features and bar interval"""
+        for entry in sorted(self.entries(), key=lambda e: e['trained_at'], reverse=True):
+            if entry.get('format_version') not in READABLE_FORMATS:
+                continue
+            if features is not None and entry.get('features') != list(features):
+                continue
+            # Models registered before intervals were configurable are weekly
+            if interval is not None and entry.get('interval', '1wk') != interval:
+                continue
+            if os.path.exists(os.path.join(self.root, entry['file'])):
+                return entry
+        return None
+
+    def load(self, entry):
+        model_data = load_model(os.path.join(self.root, entry['file']))
+        model_data['version'] = entry['version']
+        return model_data
@@ -0,0 +1,101 @@
+import numpy as np
+from config import Config
+
+# Same indicator definitions as FTSEDataCollector._add_features, computed for a whole
+# (bars x tickers) panel at once. Each ticker's column starts at its first bar and is
+# NaN-padded after its last, so every value only depends on that ticker's own history.
+
+def build_close_panel(frames):
+    """Stack {ticker: DataFrame} closes into a left-aligned (bars x tickers) array.
+    Returns the panel, the ticker order and each ticker's number of bars."""
+    tickers = list(frames)
+    lengths = np.array([len(frames[t]) for t in tickers], dtype=np.int64)
+    close = np.full((lengths.max() if len(lengths) else 0, len(tickers)), np.nan)
+    for column, ticker in enumerate(tickers):
+        close[:lengths[column], column] = frames[ticker]['Close'].values
+    return close, tickers, lengths
+
+def _shift(x, periods):
+    shifted = np.full_like(x, np.nan)
+    shifted[periods:] = x[:-periods]
+    return shifted
+
+def _ffill(x):
+    rows = np.where(np.isnan(x), 0, np.arange(x.shape[0])[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    return np.take_along_axis(x, rows, axis=0)
+
+def _window_sums(x, window):
+    """Rolling sums of x and x**2 plus a flag for windows that are complete and NaN-free"""
+    missing = np.isnan(x)
+    values = np.where(missing, 0.0, x)
+    padding = np.zeros((1, x.shape[1]))
+    cum = np.concatenate([padding, np.cumsum(values, axis=0)])
+    cum_sq = np.concatenate([padding, np.cumsum(values * values, axis=0)])
+    cum_missing = np.concatenate([padding, np.cumsum(missing, axis=0)])
+
+    sums = np.full_like(x, np.nan)
+    sums_sq = np.full_like(x, np.nan)
+    valid = np.zeros(x.shape, dtype=bool)
+    sums[window - 1:] = cum[window:] - cum[:-window]
+    sums_sq[window - 1:] = cum_sq[window:] - cum_sq[:-window]
+    valid[window - 1:] = (cum_missing[window:] - cum_missing[:-window]) == 0
+    return sums, sums_sq, valid
+
+def rolling_mean(x, window):
+    sums, _, valid = _window_sums(x, window)
+    return np.where(valid, sums / window, np.nan)
+
+def rolling_std(x, window):
+    sums, sums_sq, valid = _window_sums(x, window)
+    var = (sums_sq - sums * sums / window) / (window - 1)
+    return np.where(valid, np.sqrt(np.maximum(var, 0)), np.nan)
+
+def ewm_mean(x, span):
+    """Adjusted exponentially weighted mean, matching pandas ewm(span=span).mean()"""
+    decay = 1 - 2 / (span + 1)
+    out = np.full_like(x, np.nan)
+    num = np.zeros(x.shape[1])
+    den = np.zeros(x.shape[1])
+    for t in range(x.shape[0]):
+        valid = ~np.isnan(x[t])
+        num = decay * num + np.where(valid, x[t], 0.0)
+        den = decay * den + valid
+        out[t] = np.where(den > 0, num / np.where(den > 0, den, 1), np.nan)
+    return out
+
+def compute_panel_features(close):
+    """Return {feature: (bars x tickers) array} for every Config.FEATURES entry"""
+    features = {}
+
+    # Basic returns, with gaps padded forward like pandas pct_change
+    padded = _ffill(close)
+    for weeks in Config.RETURN_WEEKS:
+        features[f'return_{weeks}w'] = padded / _shift(padded, Config.bars(weeks)) - 1
+
+    # Simple moving average crossover
+    sma = rolling_mean(close, Config.bars(Config.SMA_WEEKS))
+    with np.errstate(invalid='ignore'):
+        features['sma_cross'] = (close > sma).astype(float)
+
+    # Basic RSI
+    delta = np.diff(close, axis=0, prepend=close[:1])
+    with np.errstate(invalid='ignore'):
+        gain = np.where(delta > 0, delta, 0)
+        loss = np.where(delta < 0, -delta, 0)
+    rsi_window = Config.bars(Config.RSI_WEEKS)
+    rs = rolling_mean(gain, rsi_window) / (rolling_mean(loss, rsi_window) + 1e-9)
+    features['rsi'] = 100 - (100 / (1 + rs))
+
+    # Simple MACD
+    macd = ewm_mean(close, Config.bars(Config.MACD_FAST_WEEKS)) - ewm_mean(close, Config.bars(Config.MACD_SLOW_WEEKS))
+    signal = rolling_mean(macd, Config.bars(Config.MACD_SIGNAL_WEEKS))
+    with np.errstate(invalid='ignore'):
+        features['macd_signal'] = (macd > signal).astype(float)
+
+    # Basic volatility
+    features['volatility'] = rolling_std(features['return_1w'], Config.bars(Config.VOLATILITY_WEEKS))
+
+    for name, values in features.items():
+        features[name] = np.nan_to_num(values, nan=0.0, posinf=np.inf, neginf=-np.inf)
+    return features
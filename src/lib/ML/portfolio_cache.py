@@ -0,0 +1,68 @@
+import time
+import threading
+from collections import OrderedDict
+from config import Config
+
+class PortfolioCache:
+    """LRU of amount-independent stock selections keyed by (industry, risk level,
+    model version, data as-of, constituents version). Once a selection for a newer
+    model, newer data or newer constituents is stored, everything older is dropped."""
+
+    def __init__(self, max_entries=None, live_ttl=None):
+        self.max_entries = max_entries or Config.PORTFOLIO_CACHE_SIZE
+        self.live_ttl = Config.PORTFOLIO_CACHE_LIVE_SECONDS if live_ttl is None else live_ttl
+        self.entries = OrderedDict()
+        self.generation = None
+        self.live_as_of = None
+        self.lock = threading.Lock()
+
+    def key(self, industry, level, model_version, table=None, constituents=None):
+        """Cache key for a request answered from the given prediction table, or live if None,
+        with companies from the given constituents version"""
+        if table is not None:
+            data_as_of = f"table:{table.generated_at}"
+        else:
+            data_as_of = f"live:{self.live_as_of}"
+        return (industry.lower(), level, model_version, data_as_of, constituents)
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            selection, expires = entry
+            if expires is not None and time.monotonic() > expires:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return selection
+
+    def put(self, key, selection, live=False):
+        """Store a selection; live ones expire as the prices behind them are refreshed"""
+        with self.lock:
+            generation = key[2:]
+            if generation != self.generation:
+                # A new model, new predictions or new constituents landed, older selections
+                # are never served again
+                self.entries.clear()
+                self.generation = generation
+            expires = time.monotonic() + self.live_ttl if live else None
+            self.entries[key] = (selection, expires)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def note_scored(self, scored):
+        """Move the live data as-of date forward to the newest bar among live predictions"""
+        dates = [prediction['as_of'] for prediction in scored.values() if prediction.get('as_of')]
+        if not dates:
+            return
+        with self.lock:
+            newest = max(dates)
+            if self.live_as_of is None or newest > self.live_as_of:
+                self.live_as_of = newest
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.generation = None
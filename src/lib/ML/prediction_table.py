@@ -0,0 +1,61 @@
+import os
+import json
+import time
+from datetime import datetime
+from config import Config
+
+class PredictionTable:
+    """Latest predictions for the whole universe, keyed by ticker"""
+
+    def __init__(self, predictions, model_version, generated_at):
+        self.predictions = predictions
+        self.model_version = model_version
+        self.generated_at = generated_at
+
+    @classmethod
+    def load(cls, path=None):
+        path = path or Config.PREDICTION_TABLE_PATH
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return cls(data['predictions'], data['model_version'], data['generated_at'])
+
+    def is_usable(self, model_version):
+        """Only serve predictions made recently by the model currently loaded"""
+        age = time.time() - self.generated_at
+        return self.model_version == model_version and age < Config.PREDICTION_TABLE_MAX_AGE_HOURS * 3600
+
+    def lookup(self, tickers):
+        return {ticker: self.predictions[ticker] for ticker in tickers if ticker in self.predictions}
+
+    def save(self, path=None):
+        path = path or Config.PREDICTION_TABLE_PATH
+        data = {
+            'model_version': self.model_version,
+            'generated_at': self.generated_at,
+            'generated_at_iso': datetime.fromtimestamp(self.generated_at).isoformat(),
+            'predictions': self.predictions
+        }
+        # Replace atomically so requests never read a partial table
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+_cached_table = None
+_cached_mtime = None
+
+def get_prediction_table(path=None):
+    """Return the table on disk, re-reading it only when the file changes"""
+    global _cached_table, _cached_mtime
+    path = path or Config.PREDICTION_TABLE_PATH
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return None
+    if mtime != _cached_mtime:
+        _cached_table = PredictionTable.load(path)
+        _cached_mtime = mtime
+    return _cached_table
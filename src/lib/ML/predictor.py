@@ -1,78 +1,128 @@
 import os
 
+import copy
+
+import time
+
 import pickle
 
+import threading
+
 from data_collector import FTSEDataCollector
 
 from config import Config
 
+from model_registry import ModelRegistry
+
+from metrics import metrics
+
 
 
 class StockPredictor:
 
-    def __init__(self):
+    def __init__(self, registry=None):
 
         self.data_collector = FTSEDataCollector()
 
-        self.model_data = self.load_latest_model()
+        self.registry = registry or ModelRegistry()
+
+        self.refresh_lock = threading.Lock()
+
+        self.manifest_mtime = self.registry.manifest_mtime()
+
+        self.last_refresh_check = time.time()
+
+        # (version, model_data), replaced as a whole so readers never mix two models
+
+        self.current = self.load_latest_model()
+
+        
+
+    @property
+
+    def model_version(self):
+
+        return self.current[0]
+
+        
+
+    @property
+
+    def model_data(self):
+
+        return self.current[1]
+
+        
+
+    def pinned(self):
+
+        """A view of this predictor that keeps its current model, so one request
+
+        scores and caches with a single version even if a newer one is swapped in"""
+
+        return copy.copy(self)
 
         
 
     def load_latest_model(self):
 
+        """Return (version, model_data) of the newest usable model, or (None, None)"""
+
         try:
 
-            # Get the absolute path to the ML directory
+            entry = self.registry.latest(Config.FEATURES, Config.INTERVAL)
 
-            current_dir = os.path.dirname(os.path.abspath(__file__))
+            if entry is not None:
 
-            ml_dir = os.path.join(current_dir, '..', 'lib', 'ML')
+                print(f"Loading model {entry['version']} from {self.registry.root}")
 
-            model_path = os.path.join(ml_dir, 'trained_model_20241106.pkl')
+                return entry['version'], self.registry.load(entry)
 
             
 
-            print(f"Looking for model at: {model_path}")
+            print(f"No valid model in registry at {self.registry.root}")
 
             
 
-            if os.path.exists(model_path):
+            # Get the absolute path to the ML directory
 
-                print(f"Found model at: {model_path}")
+            current_dir = os.path.dirname(os.path.abspath(__file__))
 
-                with open(model_path, 'rb') as f:
+            ml_dir = os.path.join(current_dir, '..', 'lib', 'ML')
 
-                    return pickle.load(f)
+            
 
-            else:
+            for directory in [ml_dir, current_dir]:
 
-                # Try alternative path
+                # Fall back to a model pickled by older versions of train_model.py
 
-                alternative_path = os.path.join(current_dir, 'trained_model_20241106.pkl')
+                pickle_path = os.path.join(directory, 'trained_model_20241106.pkl')
 
-                print(f"Trying alternative path: {alternative_path}")
+                print(f"Looking for model at: {pickle_path}")
 
                 
 
-                if os.path.exists(alternative_path):
+                if os.path.exists(pickle_path):
 
-                    print(f"Found model at: {alternative_path}")
+                    print(f"Found pickled model at: {pickle_path}")
 
-                    with open(alternative_path, 'rb') as f:
+                    with open(pickle_path, 'rb') as f:
 
-                        return pickle.load(f)
+                        model_data = pickle.load(f)
 
-                else:
+                    return 'legacy-20241106', model_data
 
-                    print("Model file not found in either location")
+            
 
-                    print(f"Current directory: {current_dir}")
+            print("Model file not found in either location")
 
-                    print(f"Directory contents: {os.listdir(current_dir)}")
+            print(f"Current directory: {current_dir}")
 
-                    return None
+            print(f"Directory contents: {os.listdir(current_dir)}")
 
-                
+            return None, None
+
+            
 
         except Exception as e:
 
@@ -82,58 +132,144 @@ class StockPredictor:
 
             print(f"Directory contents: {os.listdir()}")
 
-            return None
+            return None, None
 
 
 
-    def predict_stock(self, ticker):
+    def refresh_model(self, force=False):
 
-        try:
+        """Swap in the newest registered model if the manifest changed since the last check"""
 
-            if self.model_data is None:
+        if not force and time.time() - self.last_refresh_check < Config.MODEL_REFRESH_SECONDS:
 
-                print("Model data not available")
+            return False
 
-                return None
+        
 
-                
+        # One thread checks and loads at a time; the others then see the new version
 
-            data = self.data_collector.get_stock_data(ticker)
+        with self.refresh_lock:
 
-            if data is None or data.empty:
+            now = time.time()
 
-                return None
+            if not force and now - self.last_refresh_check < Config.MODEL_REFRESH_SECONDS:
 
-                
+                return False
 
-            latest_features = [data[col].iloc[-1] for col in Config.FEATURES]
+            self.last_refresh_check = now
 
-            scaled_features = self.model_data['scaler'].transform([latest_features])
+            
+
+            mtime = self.registry.manifest_mtime()
+
+            if not force and mtime == self.manifest_mtime:
 
-            predicted_return = self.model_data['model'].predict(scaled_features)[0]
+                return False
+
+            self.manifest_mtime = mtime
 
             
 
-            current_price = float(data['Close'].iloc[-1])
+            try:
+
+                entry = self.registry.latest(Config.FEATURES, Config.INTERVAL)
+
+                if entry is None or entry['version'] == self.model_version:
 
-            predicted_price = current_price * (1 + predicted_return)
+                    return False
+
+                model_data = self.registry.load(entry)
+
+            except Exception as e:
+
+                print(f"Error loading new model: {e}")
+
+                return False
 
             
 
-            return {
+            # A single assignment, so in-flight predictions finish on the model they started with
 
-                'current_price': current_price,
+            self.current = (entry['version'], model_data)
 
-                'predicted_return': predicted_return,
+        metrics.count('model_reload')
 
-                'predicted_price': predicted_price
+        print(f"Switched to model {entry['version']}")
 
-            }
+        return True
+
+
+
+    def predict_many(self, tickers):
+
+        """Return {ticker: prediction} for every ticker that could be scored"""
+
+        model_data = self.model_data
+
+        if model_data is None:
+
+            print("Model data not available")
+
+            return {}
 
             
 
-        except Exception as e:
+        return self.predict_latest(self.latest_features(tickers), model_data)
+
+
+
+    def latest_features(self, tickers):
+
+        """Latest features of tickers, read from saved state or fetched in grouped downloads"""
+
+        return self.data_collector.get_latest_features_many(tickers)
+
+
+
+    def predict_latest(self, latest_features, model_data):
+
+        """Score {ticker: latest features} with a single model call"""
 
-            print(f"Error making prediction: {e}")
+        tickers = [ticker for ticker, latest in latest_features.items() if latest is not None]
+
+        if not tickers:
+
+            return {}
+
+        
+
+        # Registered models score raw features; only legacy ones carry a scaler
+
+        features = [latest_features[ticker]['features'] for ticker in tickers]
+
+        if model_data['scaler'] is not None:
+
+            with metrics.time('scaling'):
+
+                features = model_data['scaler'].transform(features)
+
+        with metrics.time('inference'):
+
+            predicted_returns = model_data['model'].predict(features)
+
+        
+
+        predictions = {}
+
+        for ticker, predicted_return in zip(tickers, predicted_returns):
+
+            latest = latest_features[ticker]
+
+            predictions[ticker] = {
+
+                'current_price': latest['close'],
+
+                'predicted_return': predicted_return,
+
+                'predicted_price': latest['close'] * (1 + predicted_return),
+
+                'as_of': latest['date'][:10]
+
+            }
 
-            return None
\ No newline at end of file
+        return predictions
\ No newline at end of file
@@ -0,0 +1,128 @@
+import os
+import json
+import time
+import tempfile
+import threading
+import numpy as np
+from config import Config
+
+# One lock per stored ticker, shared by every PriceStore on the same directory in this process
+_locks = {}
+_locks_guard = threading.Lock()
+
+class PriceStore:
+    """Weekly OHLCV history on disk, one memory-mappable .npy file per ticker"""
+
+    COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+    DTYPE = np.dtype([('date', 'i8')] + [(col, 'f8') for col in COLUMNS])
+
+    def __init__(self, root=None, max_age_hours=None):
+        self.root = root or Config.PRICE_STORE_DIR
+        if max_age_hours is None:
+            max_age_hours = Config.PRICE_STORE_MAX_AGE_HOURS
+        self.max_age = max_age_hours * 3600
+        os.makedirs(self.root, exist_ok=True)
+
+    def _paths(self, ticker):
+        base = os.path.join(self.root, ticker)
+        return base + '.npy', base + '.json'
+
+    def lock(self, ticker):
+        """Reentrant lock to hold around a ticker's reads and read-modify-write updates"""
+        key = (os.path.abspath(self.root), ticker)
+        with _locks_guard:
+            return _locks.setdefault(key, threading.RLock())
+
+    def _replace(self, path, write):
+        """Write through a uniquely named temporary file in the same directory, then swap it in,
+        so readers never see a partial file and concurrent writers never share one"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=os.path.basename(path) + '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def load_meta(self, ticker):
+        try:
+            with open(self._paths(ticker)[1]) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def load_state(self, ticker):
+        """Return the indicator state saved next to a ticker's prices, if any"""
+        try:
+            with open(os.path.join(self.root, ticker + '.state.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save_state(self, ticker, state):
+        path = os.path.join(self.root, ticker + '.state.json')
+        with self.lock(ticker):
+            self._replace(path, lambda f: f.write(json.dumps(state).encode()))
+
+    def load(self, ticker):
+        """Return (DataFrame, fetched_at) for a ticker, or (None, None) if not stored"""
+        # Imported here so load_meta and load_state callers never import pandas
+        import pandas as pd
+        data_path, meta_path = self._paths(ticker)
+        with self.lock(ticker):
+            try:
+                with open(meta_path) as f:
+                    meta = json.load(f)
+                records = np.load(data_path, mmap_mode='r')
+            except (OSError, ValueError):
+                return None, None
+        # Another process may have swapped in data whose meta is not written yet
+        if meta.get('rows', len(records)) != len(records):
+            return None, None
+
+        index = pd.to_datetime(np.asarray(records['date']), utc=True).tz_convert(meta['tz'])
+        df = pd.DataFrame({col: np.asarray(records[col]) for col in self.COLUMNS}, index=index)
+        df.index.name = 'Date'
+        return df, meta['fetched_at']
+
+    def save(self, ticker, df, fetched_at=None):
+        data_path, meta_path = self._paths(ticker)
+        index = df.index
+        if index.tz is None:
+            index = index.tz_localize('UTC')
+
+        records = np.empty(len(df), dtype=self.DTYPE)
+        records['date'] = index.tz_convert('UTC').as_unit('ns').asi8
+        for col in self.COLUMNS:
+            records[col] = df[col].values
+
+        meta = {
+            'tz': str(index.tz),
+            'fetched_at': time.time() if fetched_at is None else fetched_at,
+            'last_date': str(index[-1]) if len(index) else None,
+            'rows': len(records)
+        }
+
+        # Readers in this process take the same lock, so they never pair new data with old meta
+        with self.lock(ticker):
+            self._replace(data_path, lambda f: np.save(f, records))
+            self._replace(meta_path, lambda f: f.write(json.dumps(meta).encode()))
+
+    def is_fresh(self, fetched_at):
+        return fetched_at is not None and time.time() - fetched_at < self.max_age
+
+    @staticmethod
+    def merge(stored, new):
+        """Append newly fetched bars, letting them replace any overlapping stored bars"""
+        import pandas as pd
+        if new is None or new.empty:
+            return stored
+        new = new[PriceStore.COLUMNS]
+        if stored is None or stored.empty:
+            return new
+        new = new.tz_convert(stored.index.tz) if new.index.tz is not None else new
+        return pd.concat([stored[stored.index < new.index[0]], new])
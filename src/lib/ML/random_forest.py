@@ -1,9 +1,47 @@
+import os
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+# Features are quantized into at most this many split candidates so bin ids fit in uint8
+MAX_BINS = 255
+# Rows sampled to choose bin edges when training out of core
+MAX_EDGE_SAMPLE = 200000
+
+def compute_bin_edges(X, max_bins=MAX_BINS):
+    """Return the candidate split thresholds for each feature column"""
+    edges = []
+    for feature in range(X.shape[1]):
+        values = np.unique(X[:, feature])
+        if len(values) > max_bins:
+            quantiles = np.linspace(0, 1, max_bins + 1)[1:]
+            values = np.unique(np.quantile(X[:, feature], quantiles))
+        edges.append(values)
+    return edges
+
+def bin_features(X, edges):
+    """Map each value to the index of the first edge >= value, so bin <= b means x <= edges[b]"""
+    X_binned = np.empty(X.shape, dtype=np.uint8)
+    for feature, feature_edges in enumerate(edges):
+        X_binned[:, feature] = np.searchsorted(feature_edges, X[:, feature], side='left')
+    return X_binned
+
+def _walk(X, feature, threshold, left, right, nodes, depth):
+    """Advance every (tree, row) position one level per step until all reach a leaf.
+    Leaves point back at themselves, so extra steps leave finished rows in place."""
+    rows = np.arange(X.shape[0])
+    for _ in range(depth):
+        go_left = X[rows, feature[nodes]] <= threshold[nodes]
+        nodes = np.where(go_left, left[nodes], right[nodes])
+    return nodes
 
 class DecisionTree:
-    def __init__(self, max_depth=5):
+    def __init__(self, max_depth=5, max_features=None):
         self.max_depth = max_depth
+        # Features tried at each split, None for a third of them
+        self.max_features = max_features
         self.root = None
+        self.feature = None
     
     class Node:
         def __init__(self):
@@ -19,87 +57,194 @@ class DecisionTree:
         X = X[valid_mask]
         y = y[valid_mask]
         
-        self.root = self._build_tree(X, y)
+        edges = compute_bin_edges(X)
+        self.fit_binned(bin_features(X, edges), y, edges)
+    
+    def fit_binned(self, X_binned, y, edges, rng=None, counts=None):
+        """Fit on features already quantized by bin_features. counts gives how many times
+        each row is sampled, so a bootstrap needs no copy of the rows."""
+        if rng is None:
+            rng = np.random.default_rng()
+        counts = np.ones(len(y)) if counts is None else np.asarray(counts, dtype=np.float64)
+        # Each node owns a contiguous range of this one index array, partitioned in place
+        rows = np.flatnonzero(counts)
+        self.root = self._build_tree(X_binned, y, counts, rows, 0, len(rows), edges, rng)
+        self.compile()
+    
+    def compile(self):
+        """Flatten the node graph into parallel arrays indexed by node id, root first.
+        Leaves have feature 0, an infinite threshold and point back at themselves."""
+        feature, threshold, left, right, value = [], [], [], [], []
+        depth = 0
+        
+        def add(node, level):
+            nonlocal depth
+            depth = max(depth, level)
+            index = len(feature)
+            feature.append(0)
+            threshold.append(np.inf)
+            left.append(index)
+            right.append(index)
+            value.append(0.0)
+            if node.value is not None:
+                value[index] = node.value
+            else:
+                feature[index] = node.feature
+                threshold[index] = node.threshold
+                left[index] = add(node.left, level + 1)
+                right[index] = add(node.right, level + 1)
+            return index
+        
+        add(self.root, 0)
+        self.feature = np.array(feature, dtype=np.int32)
+        self.threshold = np.array(threshold, dtype=np.float64)
+        self.left = np.array(left, dtype=np.int32)
+        self.right = np.array(right, dtype=np.int32)
+        self.value = np.array(value, dtype=np.float64)
+        self.depth = depth
     
-    def _build_tree(self, X, y, depth=0):
+    def _build_tree(self, X, y, counts, rows, start, end, edges, rng, depth=0):
         node = self.Node()
+        value, feature, split_bin = self._find_split(X, y, counts, rows[start:end], edges, rng, depth)
         
-        # Leaf conditions
-        if depth >= self.max_depth or len(y) < 2:
-            node.value = np.mean(y)
+        # If no good split found, make leaf
+        if feature is None:
+            node.value = value
             return node
         
+        # Split the node
+        node.feature = feature
+        node.threshold = edges[feature][split_bin]
+        middle = start + self._partition(X, rows[start:end], feature, split_bin)
+        
+        node.left = self._build_tree(X, y, counts, rows, start, middle, edges, rng, depth + 1)
+        node.right = self._build_tree(X, y, counts, rows, middle, end, edges, rng, depth + 1)
+        
+        return node
+    
+    def _find_split(self, X, y, counts, node_rows, edges, rng, depth):
+        """Return (mean target, feature, bin) of the best split of these rows, with feature
+        None if the node should be a leaf. Rows are weighted by their sample counts."""
+        weight = counts[node_rows]
+        y_node = y[node_rows]
+        n = np.sum(weight)
+        mean = np.dot(weight, y_node) / n
+        
+        # Leaf conditions
+        if depth >= self.max_depth or n < 2:
+            return mean, None, None
+        
         # Randomly select features to consider (random forest characteristic)
         n_features = X.shape[1]
-        feature_subset = np.random.choice(n_features, max(1, n_features//3), replace=False)
+        subset_size = self.max_features or max(1, n_features//3)
+        feature_subset = rng.choice(n_features, min(subset_size, n_features), replace=False)
         
         best_var_reduction = 0
         best_feature = None
-        best_threshold = None
+        best_bin = None
         
-        current_variance = np.var(y)
+        # Work with centered targets so the sums of squares stay well conditioned
+        y_centered = y_node - mean
+        weighted = weight * y_centered
+        weighted_squared = weighted * y_centered
+        current_sse = np.sum(weighted_squared)
         
-        # Find best split
+        # Find best split over every bin boundary using per-bin histograms
         for feature in feature_subset:
-            # Use percentiles for thresholds
-            thresholds = np.percentile(X[:, feature], [25, 50, 75])
+            n_bins = len(edges[feature]) + 1
+            bins = X[node_rows, feature]
             
-            for threshold in thresholds:
-                left_mask = X[:, feature] <= threshold
-                right_mask = ~left_mask
-                
-                # Need minimum samples in each split
-                if np.sum(left_mask) < 2 or np.sum(right_mask) < 2:
-                    continue
-                
-                left_variance = np.var(y[left_mask])
-                right_variance = np.var(y[right_mask])
-                
-                # Calculate variance reduction
-                n_left = np.sum(left_mask)
-                n_right = np.sum(right_mask)
-                var_reduction = current_variance - (
-                    (n_left * left_variance + n_right * right_variance) / len(y)
-                )
-                
-                if var_reduction > best_var_reduction:
-                    best_var_reduction = var_reduction
-                    best_feature = feature
-                    best_threshold = threshold
-        
-        # If no good split found, make leaf
-        if best_feature is None:
-            node.value = np.mean(y)
-            return node
-        
-        # Split the node
-        node.feature = best_feature
-        node.threshold = best_threshold
-        
-        left_mask = X[:, best_feature] <= best_threshold
-        right_mask = ~left_mask
-        
-        node.left = self._build_tree(X[left_mask], y[left_mask], depth + 1)
-        node.right = self._build_tree(X[right_mask], y[right_mask], depth + 1)
+            n_left = np.cumsum(np.bincount(bins, weights=weight, minlength=n_bins))[:-1]
+            sum_left = np.cumsum(np.bincount(bins, weights=weighted, minlength=n_bins))[:-1]
+            sq_left = np.cumsum(np.bincount(bins, weights=weighted_squared, minlength=n_bins))[:-1]
+            n_right = n - n_left
+            
+            # Need minimum samples in each split
+            valid = (n_left >= 2) & (n_right >= 2)
+            if not np.any(valid):
+                continue
+            
+            n_left = n_left[valid]
+            n_right = n_right[valid]
+            sum_left = sum_left[valid]
+            sse_left = sq_left[valid] - sum_left ** 2 / n_left
+            sse_right = (current_sse - sq_left[valid]) - sum_left ** 2 / n_right
+            
+            # Calculate variance reduction
+            var_reduction = (current_sse - sse_left - sse_right) / n
+            best = np.argmax(var_reduction)
+            
+            if var_reduction[best] > best_var_reduction:
+                best_var_reduction = var_reduction[best]
+                best_feature = feature
+                best_bin = np.flatnonzero(valid)[best]
         
-        return node
+        return mean, best_feature, best_bin
     
-    def predict(self, X):
-        return np.array([self._predict_single(x, self.root) for x in X])
+    @staticmethod
+    def _partition(X, node_rows, feature, split_bin):
+        """Reorder the node's range of the shared row index so the rows going left come
+        first, each side keeping its order; returns how many go left. Only a mask and an
+        ordering the size of the node are allocated, the rows themselves are never copied."""
+        go_left = X[node_rows, feature] <= split_bin
+        node_rows[:] = node_rows[np.argsort(~go_left, kind='stable')]
+        return int(np.count_nonzero(go_left))
     
-    def _predict_single(self, x, node):
-        if node.value is not None:
-            return node.value
-        
-        if x[node.feature] <= node.threshold:
-            return self._predict_single(x, node.left)
-        return self._predict_single(x, node.right)
+    def predict(self, X):
+        # Models pickled before trees were flattened only have the node graph
+        if getattr(self, 'feature', None) is None:
+            self.compile()
+        X = np.asarray(X, dtype=np.float64)
+        nodes = np.zeros(X.shape[0], dtype=np.int32)
+        nodes = _walk(X, self.feature, self.threshold, self.left, self.right, nodes, self.depth)
+        return self.value[nodes]
     
+def _fit_tree(X_binned, y, edges, max_depth, seed, max_features=None):
+    """Train one tree on a bootstrap sample drawn from its own seed"""
+    rng = np.random.default_rng(seed)
+    # Sample counts per row stand in for the resampled rows, which are never copied
+    counts = np.bincount(rng.integers(0, len(y), len(y)), minlength=len(y))
+    tree = DecisionTree(max_depth=max_depth, max_features=max_features)
+    tree.fit_binned(X_binned, y, edges, rng, counts)
+    return tree
+
+# Training data attached from shared memory in each pool worker
+_worker_data = None
+
+def _attach_shared(x_name, x_shape, y_name, edges):
+    global _worker_data
+    x_shm = shared_memory.SharedMemory(name=x_name)
+    y_shm = shared_memory.SharedMemory(name=y_name)
+    X_binned = np.ndarray(x_shape, dtype=np.uint8, buffer=x_shm.buf)
+    y = np.ndarray((x_shape[0],), dtype=np.float64, buffer=y_shm.buf)
+    _worker_data = (x_shm, y_shm, X_binned, y, edges)
+
+def _fit_tree_shared(max_depth, seed, max_features):
+    _, _, X_binned, y, edges = _worker_data
+    return _fit_tree(X_binned, y, edges, max_depth, seed, max_features)
+
+def _valid_rows(X, y):
+    """Drop rows with NaN or infinite targets or features"""
+    valid_mask = ~np.isnan(y) & ~np.isinf(y)
+    valid_mask &= ~np.any(np.isnan(X), axis=1)
+    valid_mask &= ~np.any(np.isinf(X), axis=1)
+    return X[valid_mask], y[valid_mask]
+
 class RandomForest:
-    def __init__(self, n_trees=10, max_depth=5):
+    def __init__(self, n_trees=10, max_depth=5, n_jobs=1, random_state=None, max_features=None, max_bins=MAX_BINS):
         self.n_trees = n_trees
         self.max_depth = max_depth
+        # Features tried at each split (None for a third) and split candidates per feature
+        self.max_features = max_features
+        self.max_bins = max_bins
+        if not 2 <= max_bins <= MAX_BINS:
+            raise ValueError(f"max_bins must be between 2 and {MAX_BINS}")
+        self.n_jobs = n_jobs
+        self.random_state = random_state
         self.trees = []
+        self.roots = None
+        # When each tree was trained, None if unknown; kept in step with trees by warm starts
+        self.tree_trained_at = None
     
     def fit(self, X, y):
         # Convert inputs to numpy arrays
@@ -107,28 +252,190 @@ class RandomForest:
         y = np.asarray(y)
         
         # Remove invalid values
-        valid_mask = ~np.isnan(y) & ~np.isinf(y)
-        valid_mask &= ~np.any(np.isnan(X), axis=1)
-        valid_mask &= ~np.any(np.isinf(X), axis=1)
+        X, y = _valid_rows(X, y)
         
-        X = X[valid_mask]
-        y = y[valid_mask]
+        # Quantize features once and share the bins across all trees
+        edges = compute_bin_edges(X, self.max_bins)
+        self._fit_binned(bin_features(X, edges), y, edges)
+    
+    def fit_chunks(self, make_chunks, sample_rows=MAX_EDGE_SAMPLE):
+        """Train without holding the raw feature matrix in memory.
+        
+        make_chunks() must return a fresh iterator of (X, y) chunks each time it is called;
+        it is read twice. The first pass picks bin edges from a uniform random sample of
+        rows, the second quantizes every row into a compact uint8 matrix the trees train on.
+        """
+        rng = np.random.default_rng(self.random_state)
+        sample = None
+        sample_keys = np.empty(0)
+        n_rows = 0
+        
+        for X, y in make_chunks():
+            X, y = _valid_rows(np.asarray(X), np.asarray(y))
+            n_rows += len(y)
+            # Keep the rows with the smallest random keys, a reservoir sample across chunks
+            keys = np.concatenate([sample_keys, rng.random(len(y))])
+            rows = X if sample is None else np.concatenate([sample, X])
+            if len(keys) > sample_rows:
+                keep = np.argpartition(keys, sample_rows)[:sample_rows]
+                keys, rows = keys[keep], rows[keep]
+            sample, sample_keys = rows, keys
+        
+        if n_rows == 0:
+            raise ValueError("No valid training rows")
+        edges = compute_bin_edges(sample, self.max_bins)
         
-        # Train trees with bootstrapped samples
-        for _ in range(self.n_trees):
-            # Bootstrap sampling
-            indices = np.random.choice(len(X), len(X), replace=True)
-            sample_X = X[indices]
-            sample_y = y[indices]
+        X_binned = None
+        y_all = np.empty(n_rows, dtype=np.float64)
+        start = 0
+        for X, y in make_chunks():
+            X, y = _valid_rows(np.asarray(X), np.asarray(y))
+            if X_binned is None:
+                X_binned = np.empty((n_rows, X.shape[1]), dtype=np.uint8)
+            X_binned[start:start + len(y)] = bin_features(X, edges)
+            y_all[start:start + len(y)] = y
+            start += len(y)
+        
+        self._fit_binned(X_binned[:start], y_all[:start], edges)
+    
+    def _fit_binned(self, X_binned, y, edges, seeds=None):
+        # One seed per tree derived from the master seed, so results do not depend on n_jobs
+        if seeds is None:
+            seeds = np.random.SeedSequence(self.random_state).spawn(self.n_trees)
+        
+        n_jobs = self.n_jobs if self.n_jobs > 0 else os.cpu_count()
+        n_jobs = min(n_jobs, len(seeds))
+        if n_jobs <= 1:
+            # Train trees with bootstrapped samples
+            for seed in seeds:
+                self.trees.append(_fit_tree(X_binned, y, edges, self.max_depth, seed, self.max_features))
+        else:
+            self.trees.extend(self._fit_parallel(X_binned, y, edges, seeds, n_jobs))
+        self.compile()
+    
+    def _fit_parallel(self, X_binned, y, edges, seeds, n_jobs):
+        """Train trees in a process pool that reads the training data from shared memory"""
+        y = np.ascontiguousarray(y, dtype=np.float64)
+        x_shm = shared_memory.SharedMemory(create=True, size=max(1, X_binned.nbytes))
+        y_shm = shared_memory.SharedMemory(create=True, size=max(1, y.nbytes))
+        try:
+            np.ndarray(X_binned.shape, dtype=np.uint8, buffer=x_shm.buf)[:] = X_binned
+            np.ndarray(y.shape, dtype=np.float64, buffer=y_shm.buf)[:] = y
             
-            # Create and train tree
-            tree = DecisionTree(max_depth=self.max_depth)
-            tree.fit(sample_X, sample_y)
-            self.trees.append(tree)
+            with ProcessPoolExecutor(
+                max_workers=n_jobs,
+                initializer=_attach_shared,
+                initargs=(x_shm.name, X_binned.shape, y_shm.name, edges)
+            ) as pool:
+                return list(pool.map(_fit_tree_shared, [self.max_depth] * len(seeds), seeds,
+                                     [self.max_features] * len(seeds)))
+        finally:
+            x_shm.close()
+            x_shm.unlink()
+            y_shm.close()
+            y_shm.unlink()
+    
+    def add_trees(self, X, y, n_trees, random_state=None, trained_at=None):
+        """Warm start: train n_trees more trees on (X, y) and append them to the forest.
+        The new trees are binned on their own rows, so X only has to hold the features the
+        existing trees split on. trained_at is recorded for each new tree for retire_trees."""
+        if not self.trees and getattr(self, 'roots', None) is not None:
+            self.trees = self._unpack()
+        trained = self._trained_at()
+        
+        X, y = _valid_rows(np.asarray(X), np.asarray(y))
+        if len(y) == 0:
+            raise ValueError("No valid training rows")
+        edges = compute_bin_edges(X, self.max_bins)
+        self._fit_binned(bin_features(X, edges), y, edges, np.random.SeedSequence(random_state).spawn(n_trees))
+        self.tree_trained_at = trained + [trained_at] * n_trees
+        self.n_trees = len(self.trees)
+    
+    def retire_trees(self, max_trees=None, trained_before=None):
+        """Drop the oldest trees until at most max_trees remain and none was trained before
+        trained_before. Trees with no recorded training time count as the oldest.
+        Returns the number of trees retired."""
+        if not self.trees and getattr(self, 'roots', None) is not None:
+            self.trees = self._unpack()
+        trained_at = self._trained_at()
+        trained = [t or '' for t in trained_at]
+        oldest_first = sorted(range(len(trained)), key=lambda i: (trained[i], i))
+        
+        retired = set()
+        if trained_before is not None:
+            retired.update(i for i in oldest_first if trained[i] < trained_before)
+        if max_trees is not None:
+            for i in oldest_first:
+                if len(trained) - len(retired) <= max_trees:
+                    break
+                retired.add(i)
+        # Never retire the whole forest
+        if oldest_first:
+            retired.discard(oldest_first[-1])
+        
+        keep = [i for i in range(len(trained)) if i not in retired]
+        self.trees = [self.trees[i] for i in keep]
+        self.tree_trained_at = [trained_at[i] for i in keep]
+        self.n_trees = len(self.trees)
+        self.compile()
+        return len(retired)
+    
+    def _trained_at(self):
+        trained_at = getattr(self, 'tree_trained_at', None)
+        return list(trained_at) if trained_at is not None else [None] * len(self.trees)
+    
+    def _unpack(self):
+        """Cut the node table of a forest built by from_arrays back into one tree per root"""
+        ends = list(self.roots[1:]) + [len(self.feature)]
+        trees = []
+        for start, end in zip(self.roots, ends):
+            tree = DecisionTree(max_depth=self.max_depth, max_features=self.max_features)
+            tree.feature = np.array(self.feature[start:end])
+            tree.threshold = np.array(self.threshold[start:end])
+            tree.left = np.array(self.left[start:end]) - start
+            tree.right = np.array(self.right[start:end]) - start
+            tree.value = np.array(self.value[start:end])
+            tree.depth = self.depth
+            trees.append(tree)
+        return trees
+    
+    def compile(self):
+        """Concatenate every tree's flat arrays into one node table; roots holds each tree's root id"""
+        for tree in self.trees:
+            if getattr(tree, 'feature', None) is None:
+                tree.compile()
+        offsets = np.cumsum([0] + [len(tree.feature) for tree in self.trees])
+        
+        self.feature = np.concatenate([tree.feature for tree in self.trees])
+        self.threshold = np.concatenate([tree.threshold for tree in self.trees])
+        self.left = np.concatenate([tree.left + offset for tree, offset in zip(self.trees, offsets)])
+        self.right = np.concatenate([tree.right + offset for tree, offset in zip(self.trees, offsets)])
+        self.value = np.concatenate([tree.value for tree in self.trees])
+        self.roots = offsets[:-1].astype(np.int32)
+        self.depth = max(tree.depth for tree in self.trees)
+    
+    @classmethod
+    def from_arrays(cls, feature, threshold, left, right, value, roots, depth, max_depth=None):
+        """Build a predict-only forest from the node table produced by compile"""
+        forest = cls(n_trees=len(roots), max_depth=depth if max_depth is None else max_depth)
+        forest.feature = feature
+        forest.threshold = threshold
+        forest.left = left
+        forest.right = right
+        forest.value = value
+        forest.roots = roots
+        forest.depth = depth
+        return forest
     
     def predict(self, X):
-        # Get predictions from all trees
-        predictions = np.array([tree.predict(X) for tree in self.trees])
+        # Models pickled before trees were flattened only have the node graph
+        if getattr(self, 'roots', None) is None:
+            self.compile()
+        X = np.asarray(X, dtype=np.float64)
+        
+        # Walk all trees for all rows together, one level per step
+        nodes = np.repeat(self.roots[:, None], X.shape[0], axis=1)
+        nodes = _walk(X, self.feature, self.threshold, self.left, self.right, nodes, self.depth)
         
         # Average predictions
-        return np.mean(predictions, axis=0)
\ No newline at end of file
+        return np.mean(self.value[nodes], axis=0)
\ No newline at end of file
@@ -1,57 +1,186 @@
-import pandas as pd
-import requests
-from bs4 import BeautifulSoup
+import os
+import re
+import csv
+import sys
+import time
+import threading
+from collections import OrderedDict
+from config import Config
+from data_sources import constituent_source
 
-def get_ftse250():
-    url = "https://en.wikipedia.org/wiki/FTSE_250_Index#Constituents"
+keywords = {
+    'technology': ['tech', 'software', 'digital', 'computer', 'it'],
+    'financial': ['bank', 'insurance', 'invest', 'finance'],
+    'healthcare': ['health', 'medical', 'pharma', 'biotech'],
+}
+
+def get_ftse250(source=None):
+    stocks = (source or constituent_source()).constituents()
+    if not stocks:
+        return None
+
+    stocks.sort(key=lambda x: x['Industry'])
+    # Replaced atomically, other processes read the snapshot as soon as its mtime changes
+    tmp_path = f"{Config.CONSTITUENTS_PATH}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=['Company', 'Ticker', 'Industry'])
+        writer.writeheader()
+        writer.writerows(stocks)
+    os.replace(tmp_path, Config.CONSTITUENTS_PATH)
+    return stocks
+
+# Unseen queries whose scan results are kept by IndustryIndex
+MAX_REMEMBERED_QUERIES = 256
+
+class IndustryIndex:
+    """Maps lower-cased search terms to the stocks company_by_industry returns for them"""
+
+    def __init__(self, stocks, version=None):
+        self.stocks = stocks
+        # mtime of the snapshot the stocks came from, so callers can tell tables apart
+        self.version = version
+        self.index = {}
+        self.recent = OrderedDict()
+        self.lock = threading.Lock()
+        terms = set(keywords)
+        for stock in stocks:
+            for text in (stock['Industry'], stock['Company']):
+                terms.add(text.lower())
+                terms.update(re.findall(r'\w+', text.lower()))
+        for term in terms:
+            self.index[term] = self._scan(term)
+
+    def _scan(self, industry):
+        search_terms = keywords.get(industry, [industry])
+        return [
+            stock for stock in self.stocks
+            if any(term in stock['Industry'].lower() or term in stock['Company'].lower()
+                  for term in search_terms)
+        ]
+
+    def lookup(self, industry):
+        industry = industry.lower()
+        matches = self.index.get(industry)
+        if matches is None:
+            matches = self._lookup_unseen(industry)
+        return list(matches)
+
+    def _lookup_unseen(self, industry):
+        """Scan for a query outside the prebuilt terms, remembering the most recent ones
+        that matched so arbitrary input cannot grow the index"""
+        with self.lock:
+            matches = self.recent.get(industry)
+            if matches is not None:
+                self.recent.move_to_end(industry)
+                return matches
+        matches = self._scan(industry)
+        if matches:
+            with self.lock:
+                self.recent[industry] = matches
+                while len(self.recent) > MAX_REMEMBERED_QUERIES:
+                    self.recent.popitem(last=False)
+        return matches
+
+_constituents = None
+_industry_index = None
+# mtime of the snapshot the constituents in memory were read from or written to
+_loaded_mtime = None
+_lock = threading.Lock()
+# Held by the one thread fetching from the data source
+_fetch_lock = threading.Lock()
+
+def _snapshot_mtime():
     try:
-        response = requests.get(url)
-        soup = BeautifulSoup(response.content, 'html.parser')
-        table = soup.find_all('table', class_='wikitable')
-        
-        if len(table) >= 3:
-            t = table[2]
-            
-            stocks = []
-            for row in t.find_all('tr')[1:]:
-                cols = row.find_all('td')
-                if len(cols) > 1:
-                    company = cols[0].text.strip()
-                    ticker = cols[1].text.strip() + '.L'
-                    industry = cols[2].text.strip()
-                    stocks.append({
-                        'Company': company,
-                        'Ticker': ticker,
-                        'Industry': industry
-                    })
-            
-            stocks.sort(key=lambda x: x['Industry'])
-            df = pd.DataFrame(stocks)
-            df.to_csv('FTSE250.csv', index=False)
-            return stocks
+        return os.stat(Config.CONSTITUENTS_PATH).st_mtime
+    except OSError:
         return None
-    except requests.RequestException as e:
-        print(f"Error fetching: {str(e)}")
+
+def _snapshot_age_hours(mtime):
+    return None if mtime is None else (time.time() - mtime) / 3600
+
+def _read_snapshot():
+    try:
+        with open(Config.CONSTITUENTS_PATH, newline='') as f:
+            return list(csv.DictReader(f))
+    except (OSError, csv.Error) as e:
+        print(f"Error reading constituents snapshot: {str(e)}")
         return None
 
-def company_by_industry(industry):
+def _set_constituents(stocks, mtime):
+    """Index stocks, then swap them in with the mtime of the snapshot they match"""
+    global _constituents, _industry_index, _loaded_mtime
+    index = IndustryIndex(stocks, mtime)
+    with _lock:
+        _constituents, _industry_index, _loaded_mtime = stocks, index, mtime
+
+def _load_snapshot():
+    """Read the snapshot and swap it in, or return None if it cannot be read"""
+    mtime = _snapshot_mtime()
+    stocks = _read_snapshot()
+    if stocks:
+        _set_constituents(stocks, mtime)
+    return stocks
+
+def refresh_constituents():
+    """Fetch the constituents from the data source, rewrite the snapshot and rebuild the index"""
     stocks = get_ftse250()
+    if stocks:
+        _set_constituents(stocks, _snapshot_mtime())
+    return stocks
+
+def load_constituents():
+    """Return the constituents, refreshing the snapshot only once it is older than the TTL.
+    Freshness follows the snapshot file, so a refresh by another process is picked up.
+    The fetch runs outside _lock; while it does, other callers get the constituents
+    already in memory."""
+    max_age = Config.CONSTITUENTS_MAX_AGE_HOURS
+    mtime = _snapshot_mtime()
+    age = _snapshot_age_hours(mtime)
+    fresh = age is not None and age < max_age
+    with _lock:
+        current = _constituents
+        if current is not None and fresh and mtime == _loaded_mtime:
+            return current
+
+    if fresh:
+        stocks = _load_snapshot()
+        if stocks:
+            return stocks
+
+    # Only one thread fetches; the others serve what is loaded, or wait if nothing is
+    if not _fetch_lock.acquire(blocking=current is None):
+        return current
+    try:
+        # Another thread may have refreshed the snapshot while this one waited
+        if current is None and _constituents is not None and _loaded_mtime == _snapshot_mtime():
+            return _constituents
+        stocks = refresh_constituents()
+    finally:
+        _fetch_lock.release()
     if not stocks:
-        return []
-    
-    industry = industry.lower()
-    keywords = {
-        'technology': ['tech', 'software', 'digital', 'computer', 'it'],
-        'financial': ['bank', 'insurance', 'invest', 'finance'],
-        'healthcare': ['health', 'medical', 'pharma', 'biotech'],
-    }
-    
-    search_terms = keywords.get(industry, [industry])
-    
-    matching_companies = [
-        stock for stock in stocks
-        if any(term in stock['Industry'].lower() or term in stock['Company'].lower()
-              for term in search_terms)
-    ]
+        # Wikipedia unavailable, a stale snapshot is better than nothing
+        stocks = current or _load_snapshot()
+    return stocks
+
+def company_by_industry(industry):
+    return industry_companies(industry)[0]
+
+def industry_companies(industry):
+    """(companies, constituents version) for an industry; the version changes whenever
+    the constituents are reloaded from a new snapshot"""
+    stocks = load_constituents()
+    if not stocks:
+        return [], None
     
-    return matching_companies
\ No newline at end of file
+    index = _industry_index
+    return index.lookup(industry), index.version
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ['refresh']:
+        stocks = refresh_constituents()
+        if stocks:
+            print(f"Saved {len(stocks)} constituents to {Config.CONSTITUENTS_PATH}")
+        else:
+            print("Failed to refresh constituents")
+    else:
+        print("Usage: python scraper.py refresh")
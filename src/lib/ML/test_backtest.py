@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+import pytest
+from backtest import WalkForwardBacktest
+
+class Memorizer:
+    """Answers with the target it saw for a row during fit, 0 for rows it never saw"""
+
+    def __init__(self, fits=None):
+        self.fits = fits
+
+    def fit(self, X, y):
+        self.table = dict(zip(X[:, 0].tolist(), y.tolist()))
+        if self.fits is not None:
+            self.fits.append(y.copy())
+
+    def predict(self, X):
+        return np.array([self.table.get(value, 0.0) for value in X[:, 0].tolist()])
+
+@pytest.fixture
+def backtest():
+    rng = np.random.default_rng(0)
+    index = pd.date_range('2020-01-03', periods=60, freq='W-FRI', tz='UTC')
+    frames = {}
+    for k in range(6):
+        close = 100 * np.exp(np.cumsum(rng.normal(scale=0.05, size=len(index))))
+        frames[f'T{k}'] = pd.DataFrame({'Close': close}, index=index)
+    # A ticker with gaps, whose targets span more positions of the shared date axis
+    frames['GAPS'] = frames['T0'].drop(index[[20, 21, 33, 40, 41, 42]]) * 1.01
+    backtest = WalkForwardBacktest(frames)
+    # Feature 0 becomes a row id, so a model that trained on a row can look its target up
+    backtest.features[:, :, 0] = np.arange(backtest.features[:, :, 0].size).reshape(backtest.features.shape[:2])
+    return backtest
+
+def run(backtest, make_model):
+    return backtest.run(risk=5, make_model=make_model, rebalance_weeks=1, retrain_weeks=1, min_train_weeks=10)
+
+def test_a_leaking_feature_does_not_pay_off_without_lookahead(backtest):
+    result = run(backtest, Memorizer)
+    # Rows scored at a rebalance date never had a known target yet, so nothing is bought
+    assert result['metrics']['invested_fraction'] == 0
+    assert result['metrics']['cumulative_return'] == 0
+
+    # The same model with targets that had not ended yet would profit every period
+    honest = backtest.training_set
+    backtest.training_set = lambda first, last, known_by=None: honest(first, min(known_by, len(backtest.dates) - 2))
+    leaked = run(backtest, Memorizer)
+    assert (leaked['returns'] >= 0).all()
+    assert leaked['metrics']['cumulative_return'] > 1
+
+def test_training_sees_exactly_the_targets_known_by_each_rebalance(backtest):
+    # Targets replaced by the date position they end on
+    known = np.isfinite(backtest.target)
+    backtest.target[known] = backtest.target_end[known]
+    assert (backtest.target_end[known] > np.nonzero(known)[0]).all()
+
+    fits = []
+    result = run(backtest, lambda: Memorizer(fits))
+    dates = np.searchsorted(backtest.dates, result['dates'].as_unit('ns').asi8)
+    trainable = known & backtest.scorable
+    assert len(fits) == len(dates)
+    for date, y in zip(dates, fits):
+        assert y.max() <= date
+        assert len(y) == np.count_nonzero(trainable & (backtest.target_end <= date))
+    # The gapped ticker has targets that end later than a horizon after their bar
+    column = backtest.tickers.index('GAPS')
+    spans = backtest.target_end[:, column] - np.arange(len(backtest.dates))
+    assert spans[known[:, column]].max() > 1
+
+def test_select_takes_the_top_positive_predictions_in_the_universe():
+    predictions = np.array([
+        [0.3, 0.1, -0.2, 0.5, 0.2],
+        [-0.1, -0.3, -0.2, -0.5, -0.2],
+        [0.1, np.nan, 0.4, 0.2, 0.0],
+    ])
+    universe = np.array([True, True, True, False, True])
+    weights = WalkForwardBacktest.select(predictions, universe, 2)
+    np.testing.assert_array_equal(weights, [
+        [0.5, 0.0, 0.0, 0.0, 0.5],
+        [0.0, 0.0, 0.0, 0.0, 0.0],
+        [0.5, 0.0, 0.5, 0.0, 0.0],
+    ])
+    # Fewer positive predictions than stocks wanted share the whole portfolio
+    np.testing.assert_array_equal(WalkForwardBacktest.select(predictions[2:], universe, 3), [[0.5, 0, 0.5, 0, 0]])
+
+def test_summary_matches_hand_computed_turnover_and_drawdown():
+    returns = np.array([0.10, -0.20, 0.05, 0.0])
+    weights = np.array([
+        [0.5, 0.5, 0.0],
+        [0.5, 0.0, 0.5],
+        [0.0, 0.0, 0.0],
+        [1.0, 0.0, 0.0],
+    ])
+    benchmark = np.array([0.01, 0.02, -0.01, 0.0])
+    metrics = WalkForwardBacktest.summary(returns, weights, benchmark, step=4)
+
+    # From cash: 0.5, then 0.5 of B swapped for C: 0.5, then all sold: 0.5, then all bought: 0.5
+    assert metrics['average_turnover'] == pytest.approx(0.5)
+    # Equity 1.1, 0.88, 0.924, 0.924; the trough is 20% under the 1.1 peak
+    assert metrics['max_drawdown'] == pytest.approx(0.88 / 1.1 - 1)
+    assert metrics['cumulative_return'] == pytest.approx(1.1 * 0.8 * 1.05 - 1)
+    assert metrics['rebalances'] == 4
+    assert metrics['average_holdings'] == pytest.approx((2 + 2 + 0 + 1) / 4)
+    assert metrics['invested_fraction'] == pytest.approx(0.75)
+    assert metrics['benchmark_cumulative_return'] == pytest.approx(1.01 * 1.02 * 0.99 - 1)
+    # Thirteen four-week periods a year
+    assert metrics['annualized_return'] == pytest.approx(0.924 ** (13 / 4) - 1)
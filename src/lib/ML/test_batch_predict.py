@@ -0,0 +1,98 @@
+import csv
+import time
+import numpy as np
+import pandas as pd
+import pytest
+import prediction_table
+import scraper
+from config import Config
+from batch_predict import build_prediction_table
+from model_registry import ModelRegistry
+from prediction_table import PredictionTable
+from predictor import StockPredictor
+from price_store import PriceStore
+from random_forest import RandomForest
+
+STOCKS = [
+    {'Company': 'Acme Bank', 'Ticker': 'ACM', 'Industry': 'Banks'},
+    {'Company': 'Bolt Bank', 'Ticker': 'BLT', 'Industry': 'Banks'},
+    {'Company': 'Crest Bank', 'Ticker': 'CRS', 'Industry': 'Banks'},
+    {'Company': 'Dale Insurance', 'Ticker': 'DAL', 'Industry': 'Insurance'},
+    {'Company': 'Eden Soft', 'Ticker': 'EDN', 'Industry': 'Software'},
+]
+REQUEST = {'investment_amount': 10000, 'risk_tolerance': 5, 'industry': 'bank'}
+
+@pytest.fixture
+def fixture_store(tmp_path, monkeypatch, main):
+    """A fresh price store, constituents snapshot and registered model, so nothing is downloaded"""
+    monkeypatch.setattr(Config, 'PRICE_STORE_DIR', str(tmp_path / 'prices'))
+    monkeypatch.setattr(Config, 'MODEL_REGISTRY_DIR', str(tmp_path / 'models'))
+    monkeypatch.setattr(Config, 'PREDICTION_TABLE_PATH', str(tmp_path / 'predictions.json'))
+    monkeypatch.setattr(Config, 'CONSTITUENTS_PATH', str(tmp_path / 'FTSE250.csv'))
+    monkeypatch.setattr(scraper, '_constituents', None)
+    monkeypatch.setattr(scraper, '_loaded_mtime', None)
+    monkeypatch.setattr(prediction_table, '_cached_mtime', None)
+
+    with open(Config.CONSTITUENTS_PATH, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=['Company', 'Ticker', 'Industry'])
+        writer.writeheader()
+        writer.writerows(STOCKS)
+
+    rng = np.random.default_rng(0)
+    store = PriceStore(f"{Config.PRICE_STORE_DIR}/{Config.INTERVAL}")
+    index = pd.date_range('2022-01-07', periods=80, freq='W-FRI', tz='Europe/London')
+    for stock in STOCKS:
+        close = 100 * np.exp(np.cumsum(rng.normal(scale=0.03, size=len(index))))
+        store.save(f"{stock['Ticker']}.L", pd.DataFrame(
+            {'Open': close, 'High': close, 'Low': close, 'Close': close, 'Volume': 1000.0}, index=index))
+
+    # Predicted returns are all positive so every bank is a candidate
+    X = rng.normal(size=(300, len(Config.FEATURES)))
+    model = RandomForest(n_trees=3, max_depth=3, random_state=0)
+    model.fit(X, 0.02 + 0.01 * np.tanh(X[:, 0]))
+    ModelRegistry().register(model, None, Config.FEATURES, {'mse': 0.0})
+
+    predictor = StockPredictor()
+    monkeypatch.setattr(main, '_predictor', predictor)
+    return predictor
+
+def live_response(main):
+    saved = Config.PREDICTION_TABLE_PATH
+    Config.PREDICTION_TABLE_PATH = saved + '.missing'
+    try:
+        main._portfolio_cache.clear()
+        return main.process_investment_data(REQUEST)
+    finally:
+        Config.PREDICTION_TABLE_PATH = saved
+        main._portfolio_cache.clear()
+
+def test_table_and_live_paths_give_the_same_portfolio(main, fixture_store):
+    table = build_prediction_table(fixture_store)
+    assert sorted(table.predictions) == sorted(stock['Ticker'] for stock in STOCKS)
+    assert table.model_version == fixture_store.model_version
+    table.save()
+
+    from_table = main.process_investment_data(REQUEST)
+    assert main.usable_prediction_table(fixture_store.pinned()) is not None
+    assert from_table['success']
+    assert {stock['ticker'] for stock in from_table['portfolio']} == {'ACM', 'BLT', 'CRS'}
+    assert from_table == live_response(main)
+
+@pytest.mark.parametrize('stale', ['model', 'age'])
+def test_stale_tables_are_ignored(main, fixture_store, stale):
+    version = fixture_store.model_version
+    generated_at = time.time()
+    if stale == 'model':
+        version = 'another-model'
+    else:
+        generated_at -= (Config.PREDICTION_TABLE_MAX_AGE_HOURS + 1) * 3600
+    # Predictions no live model would make, so serving them would show
+    bogus = {stock['Ticker']: {'current_price': 1.0, 'predicted_return': 5.0, 'predicted_price': 6.0,
+                               'as_of': '2020-01-01'} for stock in STOCKS}
+    PredictionTable(bogus, version, generated_at).save()
+
+    assert main.usable_prediction_table(fixture_store.pinned()) is None
+    response = main.process_investment_data(REQUEST)
+    assert response['success']
+    assert response == live_response(main)
+    assert all(stock['current_price'] != 1.0 for stock in response['portfolio'])
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+from config import Config
+from indicator_state import IndicatorState
+from panel_features import compute_panel_features
+
+def closes(n=120, seed=0):
+    rng = np.random.default_rng(seed)
+    return 100 * np.exp(np.cumsum(rng.normal(scale=0.03, size=n)))
+
+def batch_features(values):
+    """Features of every bar from the batch panel computation, one row per bar"""
+    features = compute_panel_features(np.asarray(values, dtype=np.float64)[:, None])
+    return np.column_stack([features[name][:, 0] for name in Config.FEATURES])
+
+@pytest.mark.parametrize('gaps', [False, True])
+def test_streaming_matches_batch_features(gaps):
+    values = closes()
+    if gaps:
+        values[[10, 11, 40, 90]] = np.nan
+    expected = batch_features(values)
+
+    state = IndicatorState()
+    for i, close in enumerate(values):
+        state.update(close)
+        if not np.isnan(close):
+            np.testing.assert_allclose(state.features(), expected[i], rtol=1e-9, atol=1e-9,
+                                       err_msg=f"bar {i}")
+
+def test_features_after_does_not_advance_the_state():
+    values = closes()
+    state = IndicatorState.from_closes(values[:-1])
+    before = state.to_dict()
+    np.testing.assert_allclose(state.features_after(values[-1]), batch_features(values)[-1],
+                               rtol=1e-9, atol=1e-9)
+    assert state.to_dict() == before
+
+def test_dict_round_trip_continues_the_stream():
+    values = closes()
+    state = IndicatorState.from_closes(values[:80], dates=[f'd{i}' for i in range(80)])
+    restored = IndicatorState.from_dict(state.to_dict())
+    assert restored.last_date == 'd79'
+    for close in values[80:]:
+        state.update(close)
+        restored.update(close)
+    assert restored.features() == state.features()
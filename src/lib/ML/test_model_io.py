@@ -0,0 +1,91 @@
+import json
+import numpy as np
+import pytest
+from sklearn.preprocessing import StandardScaler
+from model_io import TREE_ARRAYS, export_model, fold_scaler, load_model, save_model
+from random_forest import RandomForest
+
+FEATURES = ['a', 'b', 'c']
+
+@pytest.fixture
+def trained():
+    rng = np.random.default_rng(0)
+    X = rng.normal(loc=[10, -3, 0.5], scale=[4, 0.1, 2], size=(500, 3))
+    y = 0.01 * X[:, 0] + np.sin(X[:, 1] * 20) * 0.02 + rng.normal(size=500) * 0.005
+    scaler = StandardScaler().fit(X)
+    model = RandomForest(n_trees=5, max_depth=5, random_state=42)
+    model.fit(scaler.transform(X), y)
+    return model, scaler, X
+
+def save_version_1(path, model, scaler, metrics):
+    """Write the version 1 layout: unfolded thresholds plus the scaler arrays"""
+    header = {'format_version': 1, 'features': FEATURES, 'metrics': metrics,
+              'n_trees': len(model.roots), 'max_depth': model.max_depth, 'depth': int(model.depth)}
+    arrays = {name: np.ascontiguousarray(getattr(model, name)) for name in TREE_ARRAYS}
+    arrays['scaler_mean'] = np.asarray(scaler.mean_, dtype=np.float64)
+    arrays['scaler_scale'] = np.asarray(scaler.scale_, dtype=np.float64)
+    with open(path, 'wb') as f:
+        np.savez(f, header=np.frombuffer(json.dumps(header).encode(), dtype=np.uint8), **arrays)
+
+def score(model_data, X):
+    if model_data['scaler'] is not None:
+        X = model_data['scaler'].transform(X)
+    return model_data['model'].predict(X)
+
+def test_fold_scaler_makes_the_same_split_decisions(trained):
+    model, scaler, X = trained
+    folded = fold_scaler(model, scaler)
+    # Rows exactly on a folded threshold must go the same way as after scaling
+    on_edges = np.tile(X[:1], (len(folded.feature), 1))
+    split = np.isfinite(folded.threshold)
+    on_edges[np.flatnonzero(split), folded.feature[split]] = folded.threshold[split]
+    for rows in (X, on_edges):
+        np.testing.assert_array_equal(folded.predict(rows), model.predict(scaler.transform(rows)))
+
+@pytest.mark.parametrize('mmap', [True, False])
+def test_version_2_round_trip(tmp_path, trained, mmap):
+    model, scaler, X = trained
+    path = str(tmp_path / 'model.npz')
+    save_model(path, model, scaler, FEATURES, {'mse': 0.5}, trained_at='2024-01-01T00:00:00')
+
+    loaded = load_model(path, mmap=mmap)
+    assert loaded['scaler'] is None
+    assert loaded['features'] == FEATURES
+    assert loaded['metrics'] == {'mse': 0.5}
+    assert loaded['header']['format_version'] == 2
+    assert loaded['model'].tree_trained_at == ['2024-01-01T00:00:00'] * 5
+    np.testing.assert_array_equal(score(loaded, X), model.predict(scaler.transform(X)))
+
+@pytest.mark.parametrize('mmap', [True, False])
+def test_version_1_files_still_load(tmp_path, trained, mmap):
+    model, scaler, X = trained
+    path = str(tmp_path / 'model.npz')
+    save_version_1(path, model, scaler, {'mse': 0.5})
+
+    loaded = load_model(path, mmap=mmap)
+    assert loaded['scaler'] is not None
+    np.testing.assert_array_equal(score(loaded, X), model.predict(scaler.transform(X)))
+
+def test_export_rewrites_version_1_as_version_2(tmp_path, trained):
+    model, scaler, X = trained
+    old_path, new_path = str(tmp_path / 'v1.npz'), str(tmp_path / 'v2.npz')
+    save_version_1(old_path, model, scaler, {'mse': 0.5})
+    export_model(old_path, new_path)
+
+    exported = load_model(new_path)
+    assert exported['header']['format_version'] == 2
+    assert exported['scaler'] is None
+    np.testing.assert_array_equal(score(exported, X), score(load_model(old_path), X))
+
+def test_unknown_format_version_is_rejected(tmp_path, trained):
+    model, scaler, _ = trained
+    path = str(tmp_path / 'model.npz')
+    save_version_1(path, model, scaler, {})
+    with np.load(path) as npz:
+        arrays = {name: npz[name] for name in npz.files}
+    header = json.loads(bytes(arrays.pop('header')).decode())
+    header['format_version'] = 99
+    with open(path, 'wb') as f:
+        np.savez(f, header=np.frombuffer(json.dumps(header).encode(), dtype=np.uint8), **arrays)
+    with pytest.raises(ValueError):
+        load_model(path)
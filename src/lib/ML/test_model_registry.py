@@ -0,0 +1,79 @@
+import threading
+from datetime import datetime
+import numpy as np
+import pytest
+from model_registry import ModelRegistry
+from predictor import StockPredictor
+from random_forest import RandomForest
+
+FEATURES = ['a', 'b']
+
+def forest(seed):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(200, 2))
+    model = RandomForest(n_trees=2, max_depth=3, random_state=seed)
+    model.fit(X, X[:, 0] * seed)
+    return model
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    monkeypatch.setattr('config.Config.FEATURES', FEATURES)
+    monkeypatch.setattr('config.Config.INTERVAL', '1wk')
+    return ModelRegistry(str(tmp_path))
+
+def register(registry, seed, day, **kwargs):
+    return registry.register(forest(seed), None, kwargs.pop('features', FEATURES), {'mse': seed},
+                             trained_at=datetime(2024, 1, day), **kwargs)
+
+def test_latest_skips_other_features_intervals_and_missing_files(registry, tmp_path):
+    assert registry.latest(FEATURES, '1wk') is None
+    first = register(registry, 1, 1)
+    register(registry, 2, 2, features=['a', 'c'])
+    register(registry, 3, 3, interval='1d')
+    missing = register(registry, 4, 4)
+    (tmp_path / missing['file']).unlink()
+
+    assert registry.latest(FEATURES, '1wk')['version'] == first['version']
+    assert registry.latest()['version'] == '20240103000000'
+
+def test_load_round_trips_the_forest(registry):
+    entry = register(registry, 1, 1)
+    X = np.random.default_rng(9).normal(size=(50, 2))
+    np.testing.assert_array_equal(registry.load(entry)['model'].predict(X), forest(1).predict(X))
+
+def test_predictor_hot_swaps_without_changing_pinned_views(registry):
+    first = register(registry, 1, 1)
+    predictor = StockPredictor(registry=registry)
+    assert predictor.model_version == first['version']
+    pinned = predictor.pinned()
+
+    second = register(registry, 2, 2)
+    assert predictor.refresh_model(force=True)
+    assert predictor.model_version == second['version']
+    assert predictor.current[1]['version'] == second['version']
+    # A request that pinned the old model keeps scoring with it
+    assert pinned.model_version == first['version']
+    assert pinned.model_data['version'] == first['version']
+    assert not predictor.refresh_model(force=True)
+
+def test_concurrent_refreshes_load_the_new_model_once(registry, monkeypatch):
+    register(registry, 1, 1)
+    predictor = StockPredictor(registry=registry)
+    second = register(registry, 2, 2)
+
+    loads = []
+    load = registry.load
+    def counting_load(entry):
+        loads.append(entry['version'])
+        return load(entry)
+    monkeypatch.setattr(registry, 'load', counting_load)
+
+    # Let the refreshes past the throttle so they race on the manifest check
+    predictor.last_refresh_check = 0
+    threads = [threading.Thread(target=predictor.refresh_model) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert loads == [second['version']]
+    assert predictor.model_version == second['version']
@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+import pytest
+from config import Config
+from data_collector import FTSEDataCollector
+from panel_features import build_close_panel, compute_panel_features
+
+def frame(n, seed, gaps=()):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(scale=0.03, size=n)))
+    close[list(gaps)] = np.nan
+    index = pd.date_range('2020-01-03', periods=n, freq='W-FRI', tz='Europe/London')
+    return pd.DataFrame({'Close': close}, index=index)
+
+@pytest.fixture
+def frames():
+    return {
+        'LONG.L': frame(160, 0),
+        'GAPS.L': frame(120, 1, gaps=(3, 4, 30, 60, 61, 62, 119)),
+        # Shorter than the slowest indicator window
+        'SHORT.L': frame(20, 2, gaps=(7,)),
+        'TINY.L': frame(2, 3),
+        'LEADING.L': frame(60, 4, gaps=(0, 1)),
+    }
+
+def test_panel_features_match_per_ticker_features(frames):
+    close, tickers, lengths = build_close_panel(frames)
+    assert list(lengths) == [len(frames[t]) for t in tickers]
+    features = compute_panel_features(close)
+
+    collector = FTSEDataCollector(store=object(), source=object())
+    for column, ticker in enumerate(tickers):
+        expected = collector._add_features(frames[ticker].copy())
+        n = lengths[column]
+        for name in Config.FEATURES:
+            np.testing.assert_allclose(features[name][:n, column], expected[name].values,
+                                       rtol=1e-7, atol=1e-9, err_msg=f"{ticker} {name}")
+
+def test_columns_do_not_affect_each_other(frames):
+    close, tickers, lengths = build_close_panel(frames)
+    together = compute_panel_features(close)
+    for column, ticker in enumerate(tickers):
+        alone = compute_panel_features(close[:lengths[column], [column]])
+        for name in Config.FEATURES:
+            np.testing.assert_array_equal(together[name][:lengths[column], column], alone[name][:, 0])
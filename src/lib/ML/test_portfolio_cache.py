@@ -0,0 +1,80 @@
+import time
+from types import SimpleNamespace
+from portfolio_cache import PortfolioCache
+from prediction_table import PredictionTable
+
+SELECTION = {'risk_level': 'Medium', 'stocks': []}
+
+def table(generated_at, model_version='v1'):
+    return PredictionTable({}, model_version, generated_at)
+
+def test_new_model_table_or_constituents_drop_older_selections():
+    cache = PortfolioCache()
+    first = cache.key('Banks', 'MEDIUM', 'v1', table(100), constituents=1.0)
+    cache.put(first, SELECTION)
+    assert cache.get(first) is SELECTION
+    assert cache.get(cache.key('BANKS', 'MEDIUM', 'v1', table(100), constituents=1.0)) is SELECTION
+
+    for newer in (cache.key('Banks', 'MEDIUM', 'v2', table(100), constituents=1.0),
+                  cache.key('Banks', 'MEDIUM', 'v1', table(200), constituents=1.0),
+                  cache.key('Banks', 'MEDIUM', 'v1', table(100), constituents=2.0)):
+        assert newer != first
+        assert cache.get(newer) is None
+        cache.put(newer, SELECTION)
+        assert cache.get(first) is None
+        cache.put(first, SELECTION)
+
+def test_other_requests_of_one_generation_are_kept():
+    cache = PortfolioCache()
+    banks = cache.key('Banks', 'MEDIUM', 'v1', table(100))
+    cache.put(banks, SELECTION)
+    cache.put(cache.key('Banks', 'HIGH', 'v1', table(100)), SELECTION)
+    assert cache.get(banks) is SELECTION
+
+def test_live_selections_expire_and_follow_newer_prices():
+    cache = PortfolioCache(live_ttl=0.05)
+    cache.note_scored({'A': {'as_of': '2024-01-05'}})
+    key = cache.key('Banks', 'MEDIUM', 'v1')
+    cache.put(key, SELECTION, live=True)
+    assert cache.get(key) is SELECTION
+    cache.note_scored({'A': {'as_of': '2024-01-12'}, 'B': {'as_of': None}})
+    assert cache.key('Banks', 'MEDIUM', 'v1') != key
+    time.sleep(0.06)
+    assert cache.get(key) is None
+
+def test_least_recently_used_is_evicted():
+    cache = PortfolioCache(max_entries=2)
+    keys = [cache.key(industry, 'LOW', 'v1', table(100)) for industry in ('a', 'b', 'c')]
+    cache.put(keys[0], SELECTION)
+    cache.put(keys[1], SELECTION)
+    cache.get(keys[0])
+    cache.put(keys[2], SELECTION)
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is SELECTION
+
+def test_requests_miss_after_model_swap_table_regeneration_or_constituents_refresh(main):
+    companies = [{'Company': 'Acme', 'Ticker': 'ACM', 'Industry': 'Banks'}]
+    plan = {'amount': 1000.0, 'risk': 5, 'industry': 'Banks', 'companies': companies, 'constituents': 1.0}
+    predictor = SimpleNamespace(model_version='v1')
+    scored = {'ACM': {'current_price': 10.0, 'predicted_price': 11.0, 'predicted_return': 0.1}}
+    served = table(100)
+
+    selection = main.select_stocks(plan, scored)
+    main.remember_selection(plan, predictor, served, scored, selection)
+    assert main.cached_selection(plan, predictor, served) is selection
+
+    assert main.cached_selection(plan, SimpleNamespace(model_version='v2'), served) is None
+    assert main.cached_selection(plan, predictor, table(200)) is None
+    assert main.cached_selection(dict(plan, constituents=2.0), predictor, served) is None
+    assert main.cached_selection(plan, predictor, served) is selection
+
+def test_live_selection_is_not_cached_when_tickers_were_dropped(main):
+    companies = [{'Company': 'Acme', 'Ticker': 'ACM', 'Industry': 'Banks'},
+                 {'Company': 'Bolt', 'Ticker': 'BLT', 'Industry': 'Banks'}]
+    plan = {'amount': 1000.0, 'risk': 5, 'industry': 'Banks', 'companies': companies, 'constituents': 1.0}
+    predictor = SimpleNamespace(model_version='v1')
+    scored = {'ACM': {'current_price': 10.0, 'predicted_price': 11.0, 'predicted_return': 0.1,
+                      'as_of': '2024-01-05'}}
+
+    main.remember_selection(plan, predictor, None, scored, main.select_stocks(plan, scored))
+    assert main.cached_selection(plan, predictor, None) is None
@@ -0,0 +1,129 @@
+import numpy as np
+import pytest
+from random_forest import DecisionTree, RandomForest, bin_features, compute_bin_edges
+
+def make_data(n=200, n_features=4, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n, n_features))
+    y = 0.05 * X[:, 0] + 0.02 * np.sin(3 * X[:, 1]) + 0.01 * rng.normal(size=n)
+    return X, y
+
+def exact_tree(X, y, max_depth, depth=0):
+    """Reference tree that tries every distinct value of every feature as a threshold"""
+    mean = np.mean(y)
+    if depth >= max_depth or len(y) < 2:
+        return mean
+    current_sse = np.sum((y - mean) ** 2)
+    best = (0, None, None)
+    for feature in range(X.shape[1]):
+        for threshold in np.unique(X[:, feature]):
+            left = X[:, feature] <= threshold
+            n_left = np.count_nonzero(left)
+            if n_left < 2 or len(y) - n_left < 2:
+                continue
+            sse = np.sum((y[left] - y[left].mean()) ** 2) + np.sum((y[~left] - y[~left].mean()) ** 2)
+            reduction = (current_sse - sse) / len(y)
+            if reduction > best[0]:
+                best = (reduction, feature, threshold)
+    _, feature, threshold = best
+    if feature is None:
+        return mean
+    left = X[:, feature] <= threshold
+    return (feature, threshold,
+            exact_tree(X[left], y[left], max_depth, depth + 1),
+            exact_tree(X[~left], y[~left], max_depth, depth + 1))
+
+def exact_predict(node, x):
+    while isinstance(node, tuple):
+        feature, threshold, left, right = node
+        node = left if x[feature] <= threshold else right
+    return node
+
+def test_binned_fit_matches_exact_split_when_every_value_is_an_edge():
+    X, y = make_data()
+    # Fewer rows than bins, so every distinct value is a split candidate
+    tree = DecisionTree(max_depth=4, max_features=X.shape[1])
+    tree.fit(X, y)
+    reference = exact_tree(X, y, max_depth=4)
+
+    X_new, _ = make_data(seed=1)
+    for rows in (X, X_new):
+        expected = np.array([exact_predict(reference, x) for x in rows])
+        np.testing.assert_allclose(tree.predict(rows), expected, rtol=1e-9, atol=1e-12)
+
+def test_counts_weighted_fit_matches_bootstrap_copy():
+    X, y = make_data(n=300)
+    edges = compute_bin_edges(X)
+    X_binned = bin_features(X, edges)
+    sample = np.random.default_rng(7).integers(0, len(y), len(y))
+    counts = np.bincount(sample, minlength=len(y))
+
+    weighted = DecisionTree(max_depth=5)
+    weighted.fit_binned(X_binned, y, edges, np.random.default_rng(3), counts)
+    copied = DecisionTree(max_depth=5)
+    copied.fit_binned(X_binned[sample], y[sample], edges, np.random.default_rng(3))
+
+    np.testing.assert_array_equal(weighted.feature, copied.feature)
+    np.testing.assert_array_equal(weighted.threshold, copied.threshold)
+    np.testing.assert_allclose(weighted.value, copied.value, rtol=1e-12)
+    np.testing.assert_allclose(weighted.predict(X), copied.predict(X), rtol=1e-12)
+
+def test_forest_results_do_not_depend_on_n_jobs():
+    X, y = make_data(n=400)
+    serial = RandomForest(n_trees=4, max_depth=4, random_state=42)
+    serial.fit(X, y)
+    parallel = RandomForest(n_trees=4, max_depth=4, random_state=42, n_jobs=2)
+    parallel.fit(X, y)
+    np.testing.assert_array_equal(serial.predict(X), parallel.predict(X))
+
+def test_invalid_rows_are_dropped():
+    X, y = make_data(n=100)
+    X[3, 1] = np.nan
+    y[5] = np.inf
+    forest = RandomForest(n_trees=2, max_depth=3, random_state=0)
+    forest.fit(X, y)
+    assert np.isfinite(forest.predict(X[:10])).all()
+
+def test_add_trees_appends_to_a_loaded_forest():
+    X, y = make_data(n=300)
+    forest = RandomForest(n_trees=3, max_depth=4, random_state=1)
+    forest.fit(X, y)
+    before = forest.predict(X)
+    loaded = RandomForest.from_arrays(forest.feature, forest.threshold, forest.left, forest.right,
+                                      forest.value, forest.roots, forest.depth, max_depth=4)
+    np.testing.assert_array_equal(loaded.predict(X), before)
+
+    loaded.add_trees(X, y, 2, random_state=5, trained_at='2024-06-01T00:00:00')
+    assert loaded.n_trees == 5
+    assert loaded.tree_trained_at == [None] * 3 + ['2024-06-01T00:00:00'] * 2
+    # The unpacked old trees still score as before, the mean just gains the new trees
+    old_sum = before * 3
+    new_trees = RandomForest.from_arrays(*(getattr(loaded, name) for name in
+                                           ('feature', 'threshold', 'left', 'right', 'value')),
+                                         loaded.roots[3:], loaded.depth)
+    np.testing.assert_allclose(loaded.predict(X) * 5, old_sum + new_trees.predict(X) * 2, rtol=1e-9)
+
+def test_retire_trees_drops_the_oldest_first():
+    X, y = make_data(n=200)
+    forest = RandomForest(n_trees=2, max_depth=3, random_state=1)
+    forest.fit(X, y)
+    forest.tree_trained_at = ['2024-01-01', '2024-02-01']
+    forest.add_trees(X, y, 2, random_state=2, trained_at='2024-03-01')
+
+    assert forest.retire_trees(max_trees=3) == 1
+    assert forest.tree_trained_at == ['2024-02-01', '2024-03-01', '2024-03-01']
+    assert forest.retire_trees(trained_before='2024-03-01') == 1
+    assert forest.tree_trained_at == ['2024-03-01', '2024-03-01']
+    assert len(forest.roots) == forest.n_trees == 2
+
+def test_retire_trees_keeps_the_newest_tree():
+    X, y = make_data(n=200)
+    forest = RandomForest(n_trees=3, max_depth=3, random_state=1)
+    forest.fit(X, y)
+    forest.tree_trained_at = ['2024-01-01', '2024-01-02', '2024-01-03']
+    assert forest.retire_trees(trained_before='2025-01-01') == 2
+    assert forest.tree_trained_at == ['2024-01-03']
+
+def test_max_bins_is_validated():
+    with pytest.raises(ValueError):
+        RandomForest(max_bins=1)
@@ -0,0 +1,36 @@
+import io
+import json
+import time
+from types import SimpleNamespace
+
+def serve(main, lines):
+    out = io.StringIO()
+    main.PredictionWorker(iter(lines), out, threads=2).serve()
+    return [json.loads(line) for line in out.getvalue().splitlines()]
+
+def test_health_is_answered_while_requests_are_running(main, monkeypatch):
+    monkeypatch.setattr(main, '_predictor', SimpleNamespace(current=('v1', {'model': None})))
+
+    def slow(data):
+        time.sleep(0.3)
+        return {"success": True}
+    monkeypatch.setattr(main, 'process_investment_data', slow)
+
+    messages = serve(main, [
+        json.dumps({"id": 1, "investment_amount": 100, "risk_tolerance": 5}) + "\n",
+        json.dumps({"id": 2, "command": "health"}) + "\n",
+        json.dumps({"id": 3, "command": "shutdown"}) + "\n",
+    ])
+    assert [message["id"] for message in messages] == [None, 2, 3, 1]
+    health = messages[1]
+    assert health["status"] == "ok"
+    assert health["model_version"] == 'v1'
+    assert health["in_flight"] == 1
+    assert messages[2] == {"id": 3, "success": True, "status": "ok"}
+
+def test_health_is_degraded_without_a_model(main, monkeypatch):
+    monkeypatch.setattr(main, '_predictor', SimpleNamespace(current=(None, None)))
+    messages = serve(main, ['{"id": "h", "command": "health"}\n'])
+    assert messages[1]["id"] == "h"
+    assert messages[1]["status"] == "degraded"
+    assert not messages[1]["model_loaded"]
@@ -6,28 +6,46 @@ from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error
 import numpy as np
-import pickle
-from datetime import datetime
+import argparse
+from datetime import datetime, timedelta
+from model_registry import ModelRegistry
+from model_io import fold_scaler
+from panel_features import build_close_panel, compute_panel_features
+from training_matrix import TrainingMatrix
 
 class ModelTrainer:
-    def __init__(self):
+    def __init__(self, params=None):
         self.data_collector = FTSEDataCollector()
-        self.model = RandomForest()
+        self.params = self.tuned_params() if params is None else params
+        self.model = RandomForest(n_jobs=Config.TRAINING_JOBS, random_state=42, **self.params)
         self.scaler = StandardScaler()
+    
+    def tuned_params(self):
+        """Forest settings registered with the newest model, as chosen by tune_model.py"""
+        entry = ModelRegistry().latest(Config.FEATURES, Config.INTERVAL)
+        return dict(entry.get('params') or {}) if entry is not None else {}
         
     def prepare_training_data(self, df):
         if df is not None and not df.empty:
-            feature_matrix = df[Config.FEATURES].values[:-1]
-            close_prices = df['Close'].values
+            return self.training_rows(df[Config.FEATURES].values, df['Close'].values)
+        
+        return None, None
+
+    def training_rows(self, features, close_prices):
+        """Pair each bar's features with the return over the following Config.HORIZON_WEEKS"""
+        horizon = Config.bars(Config.HORIZON_WEEKS)
+        if len(close_prices) > horizon:
+            feature_matrix = features[:-horizon]
             
             # Handle zero or negative prices
             valid_prices = close_prices > 0
-            if not np.any(valid_prices[:-1]):
+            if not np.any(valid_prices[:-horizon]):
                 return None, None
                 
-            returns = np.zeros(len(close_prices) - 1)
-            valid_indices = valid_prices[:-1] & valid_prices[1:]
-            returns[valid_indices] = np.diff(close_prices)[valid_indices] / close_prices[:-1][valid_indices]
+            returns = np.zeros(len(close_prices) - horizon)
+            valid_indices = valid_prices[:-horizon] & valid_prices[horizon:]
+            change = close_prices[horizon:] - close_prices[:-horizon]
+            returns[valid_indices] = change[valid_indices] / close_prices[:-horizon][valid_indices]
             
             # Remove any invalid returns
             valid_mask = (~np.isnan(feature_matrix).any(axis=1) & 
@@ -38,60 +56,105 @@ class ModelTrainer:
             if np.sum(valid_mask) < 2:  # Need at least 2 valid samples
                 return None, None
                 
-            return feature_matrix[valid_mask].tolist(), returns[valid_mask].tolist()
+            return feature_matrix[valid_mask], returns[valid_mask]
         
         return None, None
 
-    def train_model(self):
-        print("Getting FTSE250 stocks...")
-        stocks = get_ftse250()
+    def train_out_of_core(self, all_X, all_y):
+        """Scale, train and evaluate by streaming chunks of the memory-mapped matrix.
+        Returns the test targets and predictions."""
+        test_mask = np.random.default_rng(42).random(len(all_y)) < 0.2
+        chunk_rows = Config.TRAINING_CHUNK_ROWS
         
-        if not stocks:
-            print("Failed to get FTSE250 stocks")
-            return False
-
-        all_X = []
-        all_y = []
+        def chunks(test, scale=True):
+            for start in range(0, len(all_y), chunk_rows):
+                rows = test_mask[start:start + chunk_rows] == test
+                X = np.asarray(all_X[start:start + chunk_rows][rows], dtype=np.float64)
+                y = np.asarray(all_y[start:start + chunk_rows][rows], dtype=np.float64)
+                yield (self.scaler.transform(X) if scale else X), y
+        
+        print("\nScaling features...")
+        for X, _ in chunks(test=False, scale=False):
+            self.scaler.partial_fit(X)
         
+        print("Training model out of core...")
+        self.model.fit_chunks(lambda: chunks(test=False))
+        
+        print("Making predictions...")
+        y_test = []
+        y_pred = []
+        for X, y in chunks(test=True):
+            y_test.append(y)
+            y_pred.append(self.model.predict(X))
+        return np.concatenate(y_test), np.concatenate(y_pred)
+
+    def collect_training_matrix(self, stocks, window_weeks=None, holdout_weeks=None):
+        """Training rows of every stock, only from its last window_weeks of bars if given.
+        Returns None if no rows could be built. With holdout_weeks the rows of each stock's
+        last holdout_weeks of bars go to a second, in-memory matrix and (matrix, holdout)
+        is returned; no training target reaches into the held out bars."""
         print(f"\nCollecting data for {len(stocks)} stocks...")
+        frames = self.data_collector.get_many([stock['Ticker'] for stock in stocks], add_features=False)
+        
+        # Compute every ticker's features in one pass over a (bars x tickers) panel
+        print("Building features...")
+        close, tickers, lengths = build_close_panel(frames)
+        features = compute_panel_features(close)
+        columns = {ticker: column for column, ticker in enumerate(tickers)}
+        
+        # Each ticker contributes at most one row per bar that has a full horizon after it
+        horizon = Config.bars(Config.HORIZON_WEEKS)
+        capacity = int(np.sum(np.maximum(lengths - horizon, 0)))
+        matrix = TrainingMatrix(capacity, len(Config.FEATURES), Config.TRAINING_MATRIX_DIR)
+        holdout = None
+        if holdout_weeks is not None:
+            held = Config.bars(holdout_weeks)
+            holdout = TrainingMatrix(len(tickers) * max(held - horizon, 0), len(Config.FEATURES))
+        
+        def append(target, column, first, last):
+            # Indicators still see the whole history, only the rows are windowed
+            ticker_features = np.column_stack([features[name][first:last, column] for name in Config.FEATURES])
+            X, y = self.training_rows(ticker_features, close[first:last, column])
+            if X is None or len(X) == 0:
+                return 0
+            target.append(X, y)
+            return len(X)
+        
         for stock in stocks:
             ticker = stock['Ticker']
             print(f"Processing {ticker}...")
-            data = self.data_collector.get_stock_data(ticker)
-            if data is not None:
-                X, y = self.prepare_training_data(data)
-                if X is not None and len(X) > 0:
-                    all_X.extend(X)
-                    all_y.extend(y)
-                    print(f"Added {len(X)} samples from {ticker}")
+            column = columns.get(ticker)
+            if column is not None:
+                n = lengths[column]
+                start = 0 if window_weeks is None else max(0, n - Config.bars(window_weeks))
+                end = n
+                if holdout is not None:
+                    # Held out rows are the ticker's most recent bars, evaluated as the backtest
+                    # would: on targets that come after every target trained on
+                    end = max(start, n - held)
+                    append(holdout, column, end, n)
+                added = append(matrix, column, start, end)
+                if added:
+                    print(f"Added {added} samples from {ticker}")
                 else:
                     print(f"No valid data points for {ticker}")
             else:
                 print(f"Failed to collect data for {ticker}")
         
-        if not all_X:
-            print("No training data collected")
-            return False
-        
-        print(f"\nTotal samples collected: {len(all_X)}")
+        # The panel is no longer needed once its rows are in the matrix
+        del features, close
         
-        X_train, X_test, y_train, y_test = train_test_split(
-            np.array(all_X),
-            np.array(all_y),
-            test_size=0.2,
-            random_state=42
-        )
-        
-        print("\nScaling features...")
-        X_train_scaled = self.scaler.fit_transform(X_train)
-        X_test_scaled = self.scaler.transform(X_test)
-        
-        print("Training model...")
-        self.model.fit(X_train_scaled, y_train)
-        
-        print("Making predictions...")
-        y_pred = self.model.predict(X_test_scaled)
+        if matrix.size == 0:
+            print("No training data collected")
+            return None
         
+        print(f"\nTotal samples collected: {matrix.size}")
+        if holdout is not None:
+            print(f"Held out samples: {holdout.size}")
+            return matrix, holdout
+        return matrix
+
+    def evaluate(self, y_test, y_pred):
         mse = mean_squared_error(y_test, y_pred)
         rmse = np.sqrt(mse)
         mae = mean_absolute_error(y_test, y_pred)
@@ -103,30 +166,129 @@ class ModelTrainer:
         print(f"MAE: {mae:.6f}")
         print(f"R²: {r2:.4f}")
         
-        model_data = {
-            'model': self.model,
-            'scaler': self.scaler,
-            'metrics': {
-                'mse': mse,
-                'rmse': rmse,
-                'mae': mae,
-                'r2': r2
-            }
+        return {
+            'mse': mse,
+            'rmse': rmse,
+            'mae': mae,
+            'r2': r2
         }
+
+    def train_model(self):
+        print("Getting FTSE250 stocks...")
+        stocks = get_ftse250()
+        
+        if not stocks:
+            print("Failed to get FTSE250 stocks")
+            return False
+
+        matrix = self.collect_training_matrix(stocks)
+        if matrix is None:
+            return False
         
-        timestamp = datetime.now().strftime('%Y%m%d')
-        filename = f'trained_model_{timestamp}.pkl'
-        print(f"\nSaving model as {filename}...")
+        all_X, all_y = matrix.arrays()
+        if matrix.directory is not None:
+            y_test, y_pred = self.train_out_of_core(all_X, all_y)
+        else:
+            X_train, X_test, y_train, y_test = train_test_split(
+                all_X,
+                all_y,
+                test_size=0.2,
+                random_state=42
+            )
+            
+            print("\nScaling features...")
+            X_train_scaled = self.scaler.fit_transform(X_train)
+            X_test_scaled = self.scaler.transform(X_test)
+            
+            print("Training model...")
+            self.model.fit(X_train_scaled, y_train)
+            
+            print("Making predictions...")
+            y_pred = self.model.predict(X_test_scaled)
+        
+        metrics = self.evaluate(y_test, y_pred)
+        
+        print("\nSaving model to registry...")
+        entry = ModelRegistry().register(self.model, self.scaler, Config.FEATURES, metrics,
+                                         interval=Config.INTERVAL, horizon_weeks=Config.HORIZON_WEEKS,
+                                         params=self.params)
+        print(f"Saved model version {entry['version']} as {entry['file']}")
+        
+        return True
+
+    def warm_start(self):
+        """Grow the newest registered model with trees trained on recent bars and retire
+        its oldest trees, instead of retraining every tree on the full history.
+        Falls back to train_model() when there is no model to start from."""
+        registry = ModelRegistry()
+        base = registry.latest(Config.FEATURES, Config.INTERVAL)
+        if base is None:
+            print("No registered model to warm start from, training from scratch")
+            return self.train_model()
+        
+        print(f"Warm starting from model version {base['version']}")
+        model_data = registry.load(base)
+        model = model_data['model']
+        if model_data['scaler'] is not None:
+            model = fold_scaler(model, model_data['scaler'])
+        # New trees use the tuned settings; like the saved trees they split raw features
+        for name in ('max_depth', 'max_features', 'max_bins', 'n_jobs'):
+            setattr(model, name, getattr(self.model, name))
+        
+        print("Getting FTSE250 stocks...")
+        stocks = get_ftse250()
+        if not stocks:
+            print("Failed to get FTSE250 stocks")
+            return False
+        
+        collected = self.collect_training_matrix(stocks, Config.WARM_START_WINDOW_WEEKS,
+                                                 Config.WARM_START_HOLDOUT_WEEKS)
+        if collected is None:
+            return False
+        matrix, holdout = collected
+        if holdout.size == 0:
+            print("No held out rows to evaluate on")
+            return False
+        
+        X_train, y_train = (np.asarray(a, dtype=np.float64) for a in matrix.arrays())
+        X_test, y_test = (np.asarray(a, dtype=np.float64) for a in holdout.arrays())
+        base_pred = model.predict(X_test)
+        
+        trained_at = datetime.now()
+        print(f"Training {Config.WARM_START_TREES} new trees...")
+        model.add_trees(X_train, y_train, Config.WARM_START_TREES,
+                        random_state=[42, int(trained_at.timestamp())], trained_at=trained_at.isoformat())
+        
+        max_trees = Config.WARM_START_MAX_TREES or self.model.n_trees
+        trained_before = None
+        if Config.WARM_START_MAX_AGE_WEEKS is not None:
+            trained_before = (trained_at - timedelta(weeks=Config.WARM_START_MAX_AGE_WEEKS)).isoformat()
+        retired = model.retire_trees(max_trees, trained_before)
+        print(f"Retired {retired} trees, {model.n_trees} remain")
+        
+        print("Making predictions...")
+        metrics = self.evaluate(y_test, model.predict(X_test))
+        # The base model on the same rows; its older trees may have trained on some of them
+        metrics['base_mse'] = mean_squared_error(y_test, base_pred)
+        print(f"Base model MSE: {metrics['base_mse']:.6f}")
         
-        with open(filename, 'wb') as f:
-            pickle.dump(model_data, f)
+        print("\nSaving model to registry...")
+        entry = registry.register(model, None, Config.FEATURES, metrics, trained_at=trained_at,
+                                  interval=Config.INTERVAL, horizon_weeks=Config.HORIZON_WEEKS,
+                                  params=self.params, base_version=base['version'])
+        print(f"Saved model version {entry['version']} as {entry['file']}")
         
         return True
 
 def main():
+    parser = argparse.ArgumentParser(description="Train the FTSE 250 return forest")
+    parser.add_argument('--warm-start', action='store_true',
+                        help="add trees trained on recent bars to the newest model instead of retraining")
+    args = parser.parse_args()
+    
     print("Starting FTSE250 model training...")
     trainer = ModelTrainer()
-    success = trainer.train_model()
+    success = trainer.warm_start() if args.warm_start else trainer.train_model()
     if success:
         print("\nModel training and saving completed successfully!")
     else:
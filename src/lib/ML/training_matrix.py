@@ -0,0 +1,34 @@
+import os
+import numpy as np
+
+class TrainingMatrix:
+    """Preallocated float32 feature and target buffers that training rows are written into.
+    With a directory the buffers are memory-mapped .npy files instead of RAM."""
+
+    def __init__(self, capacity, n_features, directory=None):
+        self.size = 0
+        self.directory = directory
+        if directory is None:
+            self.X = np.empty((capacity, n_features), dtype=np.float32)
+            self.y = np.empty(capacity, dtype=np.float32)
+        else:
+            os.makedirs(directory, exist_ok=True)
+            self.X = np.lib.format.open_memmap(os.path.join(directory, 'X.npy'), mode='w+',
+                                               dtype=np.float32, shape=(capacity, n_features))
+            self.y = np.lib.format.open_memmap(os.path.join(directory, 'y.npy'), mode='w+',
+                                               dtype=np.float32, shape=(capacity,))
+
+    def append(self, X, y):
+        n = len(y)
+        if self.size + n > len(self.y):
+            raise ValueError(f"Training matrix capacity {len(self.y)} exceeded")
+        self.X[self.size:self.size + n] = X
+        self.y[self.size:self.size + n] = y
+        self.size += n
+
+    def arrays(self):
+        """Views of the rows written so far"""
+        if self.directory is not None:
+            self.X.flush()
+            self.y.flush()
+        return self.X[:self.size], self.y[:self.size]
@@ -0,0 +1,180 @@
+import os
+import json
+import time
+import argparse
+import itertools
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from sklearn.preprocessing import StandardScaler
+from sklearn.metrics import mean_squared_error
+from config import Config
+from random_forest import RandomForest
+
+# Hyperparameter search for the forest.
+#
+#   python tune_model.py                 grid search over Config.SEARCH_GRID
+#   python tune_model.py --random 20     20 configurations drawn from the grid
+#   python tune_model.py --rebuild       rebuild the cached feature matrix first
+#
+# The feature matrix is built once and cached in Config.SEARCH_CACHE_DIR, where every
+# worker process memory-maps it. Trials are scored on time-ordered folds. The best
+# configuration is then trained on every row and registered with its parameters,
+# which ModelTrainer reuses for later retrains.
+
+CACHE_ARRAYS = ['X', 'y', 'dates']
+
+def build_cache(directory):
+    """Build the date-ordered feature matrix for every constituent and write it to directory"""
+    from scraper import load_constituents
+    from backtest import WalkForwardBacktest, load_frames
+
+    stocks = load_constituents()
+    if not stocks:
+        raise RuntimeError("No constituents available")
+    print(f"Collecting data for {len(stocks)} stocks...")
+    backtest = WalkForwardBacktest(load_frames([stock['Ticker'] for stock in stocks]))
+
+    arrays = {
+        'X': backtest.X[backtest.rows],
+        'y': backtest.y[backtest.rows],
+        # Bar position of each row on the shared date axis, ascending
+        'dates': backtest.rows // len(backtest.tickers)
+    }
+    os.makedirs(directory, exist_ok=True)
+    for name in CACHE_ARRAYS:
+        path = os.path.join(directory, name + '.npy')
+        with open(path + '.tmp', 'wb') as f:
+            np.save(f, arrays[name])
+        os.replace(path + '.tmp', path)
+
+    meta = {
+        'features': Config.FEATURES,
+        'interval': Config.INTERVAL,
+        'horizon_weeks': Config.HORIZON_WEEKS,
+        'rows': len(arrays['y']),
+        'built_at': time.time()
+    }
+    with open(os.path.join(directory, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+    print(f"Cached {meta['rows']} rows in {directory}")
+
+def load_cache(directory, check_age=True):
+    """Memory-map the cached (X, y, dates), or return None if it is missing, stale or
+    was built for other features, interval or horizon. A search already under way
+    passes check_age=False so the cache cannot expire part way through."""
+    try:
+        with open(os.path.join(directory, 'meta.json')) as f:
+            meta = json.load(f)
+        arrays = [np.load(os.path.join(directory, name + '.npy'), mmap_mode='r') for name in CACHE_ARRAYS]
+    except (OSError, ValueError):
+        return None
+    if (meta['features'], meta['interval'], meta['horizon_weeks']) != (Config.FEATURES, Config.INTERVAL, Config.HORIZON_WEEKS):
+        return None
+    if check_age and (time.time() - meta['built_at']) / 3600 > Config.SEARCH_CACHE_MAX_AGE_HOURS:
+        return None
+    return tuple(arrays)
+
+def time_folds(dates, n_folds):
+    """(train, test) row slices where each test block comes after everything trained on.
+    Training rows stop a horizon before the test block so no target overlaps it."""
+    unique = np.unique(dates)
+    bounds = np.linspace(0, len(unique), n_folds + 2).astype(int)
+    horizon = Config.bars(Config.HORIZON_WEEKS)
+    folds = []
+    for k in range(1, n_folds + 1):
+        test_first, test_last = unique[bounds[k]], unique[bounds[k + 1] - 1]
+        train_end = np.searchsorted(dates, test_first - horizon, side='right')
+        test = slice(np.searchsorted(dates, test_first), np.searchsorted(dates, test_last, side='right'))
+        folds.append((slice(0, train_end), test))
+    return folds
+
+def candidates(grid, n_random=None, seed=42):
+    """Every combination of the grid, or n_random of them drawn without replacement"""
+    combos = [dict(zip(grid, values)) for values in itertools.product(*grid.values())]
+    if n_random is not None and n_random < len(combos):
+        picks = np.random.default_rng(seed).choice(len(combos), n_random, replace=False)
+        combos = [combos[i] for i in sorted(picks)]
+    return combos
+
+# Cached matrix memory-mapped by each search worker
+_cache = None
+
+def _open_cache(directory):
+    global _cache
+    _cache = load_cache(directory, check_age=False)
+
+def _require_cache(directory, check_age=True):
+    cache = load_cache(directory, check_age)
+    if cache is None:
+        raise RuntimeError(f"No usable search cache in {directory}, build it with "
+                           "`python tune_model.py --rebuild` or build_cache()")
+    return cache
+
+def _evaluate(params, folds):
+    """Mean test MSE of a forest with these params over the folds"""
+    X, y, _ = _cache
+    errors = []
+    for train, test in folds:
+        scaler = StandardScaler().fit(X[train])
+        model = RandomForest(random_state=42, **params)
+        model.fit(scaler.transform(X[train]), y[train])
+        errors.append(mean_squared_error(y[test], model.predict(scaler.transform(X[test]))))
+    return float(np.mean(errors))
+
+def search(directory, trials, n_folds=None, n_jobs=None):
+    """Score every trial on time-ordered folds; returns [{'params', 'mse'}] best first"""
+    _, _, dates = _require_cache(directory)
+    folds = time_folds(np.asarray(dates), n_folds or Config.SEARCH_FOLDS)
+
+    n_jobs = n_jobs or Config.SEARCH_JOBS
+    n_jobs = min(n_jobs if n_jobs > 0 else os.cpu_count(), len(trials))
+    if n_jobs <= 1:
+        _open_cache(directory)
+        scores = [_evaluate(params, folds) for params in trials]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_open_cache, initargs=(directory,)) as pool:
+            scores = list(pool.map(_evaluate, trials, [folds] * len(trials)))
+
+    results = [{'params': params, 'mse': mse} for params, mse in zip(trials, scores)]
+    return sorted(results, key=lambda result: result['mse'])
+
+def register_best(directory, best):
+    """Train the best configuration on every cached row and register it with its params"""
+    from model_registry import ModelRegistry
+
+    X, y, _ = _require_cache(directory, check_age=False)
+    scaler = StandardScaler().fit(X)
+    model = RandomForest(n_jobs=Config.TRAINING_JOBS, random_state=42, **best['params'])
+    model.fit(scaler.transform(X), y)
+    metrics = {'cv_mse': best['mse'], 'cv_rmse': np.sqrt(best['mse'])}
+    return ModelRegistry().register(model, scaler, Config.FEATURES, metrics, interval=Config.INTERVAL,
+                                    horizon_weeks=Config.HORIZON_WEEKS, params=best['params'])
+
+def main():
+    parser = argparse.ArgumentParser(description="Search forest hyperparameters on time-ordered folds")
+    parser.add_argument('--random', type=int, help="evaluate this many random configurations instead of the full grid")
+    parser.add_argument('--folds', type=int, default=Config.SEARCH_FOLDS)
+    parser.add_argument('--jobs', type=int, default=Config.SEARCH_JOBS, help="worker processes, -1 for one per CPU")
+    parser.add_argument('--rebuild', action='store_true', help="rebuild the cached feature matrix")
+    parser.add_argument('--no-register', action='store_true', help="only report the results")
+    args = parser.parse_args()
+
+    directory = Config.SEARCH_CACHE_DIR
+    if args.rebuild or load_cache(directory) is None:
+        build_cache(directory)
+
+    trials = candidates(Config.SEARCH_GRID, args.random)
+    print(f"Evaluating {len(trials)} configurations on {args.folds} time-ordered folds...")
+    start = time.time()
+    results = search(directory, trials, args.folds, args.jobs)
+    print(f"Finished in {time.time() - start:.1f}s\n")
+
+    for result in results[:10]:
+        print(f"MSE {result['mse']:.6f}  {result['params']}")
+
+    if not args.no_register:
+        entry = register_best(directory, results[0])
+        print(f"\nSaved model version {entry['version']} with {entry['params']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import { spawn } from 'child_process';
+import path from 'path';
+
+const scriptPath = path.join(process.cwd(), 'src', 'lib', 'ML', 'main.py');
+const REQUEST_TIMEOUT_MS = 120000;
+
+let worker = null;
+let nextId = 1;
+const pending = new Map();
+
+function failPending(message) {
+    for (const { resolve, timer } of pending.values()) {
+        clearTimeout(timer);
+        resolve({ success: false, error: message });
+    }
+    pending.clear();
+}
+
+function startWorker() {
+    console.log('Starting Python prediction worker at:', scriptPath);
+    const child = spawn('python.exe', [scriptPath, '--worker']);
+    let buffer = '';
+
+    child.stdout.on('data', (data) => {
+        buffer += data.toString();
+        let newline;
+        while ((newline = buffer.indexOf('\n')) >= 0) {
+            const line = buffer.slice(0, newline).trim();
+            buffer = buffer.slice(newline + 1);
+            if (!line) continue;
+
+            let message;
+            try {
+                message = JSON.parse(line);
+            } catch (e) {
+                console.error('Worker sent invalid JSON:', line);
+                continue;
+            }
+
+            const request = pending.get(message.id);
+            if (!request) continue;
+
+            // Batch answers arrive one per request before the final done message
+            if (request.onResult && message.index !== undefined) {
+                const { id, index, ...result } = message;
+                request.onResult(index, result);
+                continue;
+            }
+            pending.delete(message.id);
+            clearTimeout(request.timer);
+            delete message.id;
+            request.resolve(message);
+        }
+    });
+
+    child.stderr.on('data', (data) => {
+        console.error('Python stderr:', data.toString());
+    });
+
+    child.on('close', (code) => {
+        console.log('Python worker exited with code:', code);
+        if (worker === child) worker = null;
+        failPending('Prediction worker exited');
+    });
+
+    child.on('error', (error) => {
+        console.error('Python worker error:', error);
+        if (worker === child) worker = null;
+        failPending('Prediction worker unavailable');
+    });
+
+    return child;
+}
+
+export function sendToWorker(payload, onResult = null) {
+    if (!worker) worker = startWorker();
+
+    const id = nextId++;
+    return new Promise((resolve) => {
+        const timer = setTimeout(() => {
+            pending.delete(id);
+            resolve({ success: false, error: 'Prediction worker timed out' });
+        }, REQUEST_TIMEOUT_MS);
+        pending.set(id, { resolve, timer, onResult });
+        worker.stdin.write(JSON.stringify({ ...payload, id }) + '\n');
+    });
+}
+
+// Scores the union of the requests' tickers once; onResult(index, result) is called
+// for each request as soon as it is ready
+export function sendBatchToWorker(requests, onResult) {
+    return sendToWorker({ command: 'batch', requests }, onResult);
+}
+
+export function workerHealth() {
+    return sendToWorker({ command: 'health' });
+}
+
+export function workerMetrics(format = 'json') {
+    return sendToWorker({ command: 'metrics', format });
+}
@@ -0,0 +1,7 @@
+import { json } from '@sveltejs/kit';
+import { workerHealth } from '$lib/server/predictionWorker.js';
+
+export async function GET() {
+    const health = await workerHealth();
+    return json(health, { status: health.success ? 200 : 503 });
+}
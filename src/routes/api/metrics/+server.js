@@ -0,0 +1,12 @@
+import { json } from '@sveltejs/kit';
+import { workerMetrics } from '$lib/server/predictionWorker.js';
+
+export async function GET({ url }) {
+    const format = url.searchParams.get('format') === 'json' ? 'json' : 'prometheus';
+    const result = await workerMetrics(format);
+    if (!result.success) return json(result, { status: 503 });
+    if (format === 'json') return json(result.metrics);
+    return new Response(result.metrics, {
+        headers: { 'Content-Type': 'text/plain; version=0.0.4' }
+    });
+}
@@ -1,6 +1,5 @@
 import { json } from '@sveltejs/kit';
-import { spawn } from 'child_process';
-import path from 'path';
+import { sendToWorker } from '$lib/server/predictionWorker.js';
 
 export async function POST({ request }) {
     try {
@@ -16,53 +15,15 @@ export async function POST({ request }) {
             }, { status: 400 });
         }
 
-        const scriptPath = path.join(process.cwd(), 'src', 'lib', 'ML', 'main.py');
-        console.log('Executing Python script at:', scriptPath);
+        // Reserved protocol fields and profiling are never taken from the client
+        const { id, command, profile, ...payload } = data;
+        const result = await sendToWorker(payload);
+        console.log('Worker result:', JSON.stringify(result));
 
-        return new Promise((resolve) => {
-            const pythonProcess = spawn('python.exe', [scriptPath]);
-            let outputData = '';
-            let errorData = '';
-
-            pythonProcess.stdin.write(JSON.stringify(data));
-            pythonProcess.stdin.end();
-
-            pythonProcess.stdout.on('data', (data) => {
-                outputData += data.toString();
-            });
-
-            pythonProcess.stderr.on('data', (data) => {
-                errorData += data.toString();
-                console.error('Python stderr:', data.toString());
-            });
-
-            pythonProcess.on('close', (code) => {
-                console.log('Python process closed with code:', code);
-                console.log('Raw output:', outputData);
-
-                if (code !== 0) {
-                    console.error('Python script error:', errorData);
-                    return resolve(json({
-                        success: false,
-                        error: "Error executing Python script"
-                    }, { status: 500 }));
-                }
-
-                try {
-                    const jsonStartIndex = outputData.indexOf('{');
-                    const jsonString = outputData.substring(jsonStartIndex);
-                    const result = JSON.parse(jsonString);
-                    resolve(json(result));
-                } catch (e) {
-                    console.error('JSON parse error:', e);
-                    console.error('Raw output:', outputData);
-                    resolve(json({
-                        success: false,
-                        error: "Error parsing prediction results"
-                    }, { status: 500 }));
-                }
-            });
-        });
+        if (!result.success && result.error && result.error.startsWith('Prediction worker')) {
+            return json(result, { status: 500 });
+        }
+        return json(result);
     } catch (error) {
         console.error('API error:', error);
         return json({
@@ -70,4 +31,4 @@ export async function POST({ request }) {
             error: "Internal server error"
         }, { status: 500 });
     }
-}
\ No newline at end of file
+}
@@ -0,0 +1,51 @@
+import { json } from '@sveltejs/kit';
+import { sendBatchToWorker } from '$lib/server/predictionWorker.js';
+
+// Largest batch accepted in one call
+const MAX_BATCH_REQUESTS = 100;
+
+// Streams one NDJSON line per request, {index, ...result}, in the order they finish
+export async function POST({ request }) {
+    let data;
+    try {
+        data = await request.json();
+    } catch (error) {
+        return json({ success: false, error: 'Invalid JSON body' }, { status: 400 });
+    }
+
+    const isObject = (value) => value !== null && typeof value === 'object' && !Array.isArray(value);
+    if (!isObject(data) || !Array.isArray(data.requests) || data.requests.length === 0) {
+        return json({ success: false, error: 'Missing requests' }, { status: 400 });
+    }
+    if (data.requests.length > MAX_BATCH_REQUESTS) {
+        return json({ success: false, error: `At most ${MAX_BATCH_REQUESTS} requests per batch` }, { status: 400 });
+    }
+    if (!data.requests.every(isObject)) {
+        return json({ success: false, error: 'Every request must be an object' }, { status: 400 });
+    }
+
+    // Reserved protocol fields and profiling are never taken from the client
+    const requests = data.requests.map(({ id, command, profile, ...payload }) => payload);
+    const encoder = new TextEncoder();
+    const stream = new ReadableStream({
+        async start(controller) {
+            const answered = new Set();
+            const result = await sendBatchToWorker(requests, (index, answer) => {
+                answered.add(index);
+                controller.enqueue(encoder.encode(JSON.stringify({ index, ...answer }) + '\n'));
+            });
+            if (!result.success) {
+                // The worker failed part way, answer whatever is still outstanding
+                requests.forEach((_, index) => {
+                    if (answered.has(index)) return;
+                    controller.enqueue(encoder.encode(JSON.stringify({ index, ...result }) + '\n'));
+                });
+            }
+            controller.close();
+        }
+    });
+
+    return new Response(stream, {
+        headers: { 'Content-Type': 'application/x-ndjson' }
+    });
+}